@@ -0,0 +1,62 @@
+# benchmarks/auth.py
+# Coste de autenticar una petición con un token repetido, sin y con la caché de claims verificados.
+# Mide get_current_user aislado (principal ya en caché, sin base) y GET /user/profile/ completo.
+# Uso: python -m benchmarks.auth [--iterations 20000] [--requests 2000]
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import login, make_client
+from benchmarks.seed import seed
+
+import utils.auth as auth
+from utils.cache import TTLCache
+
+def with_claims_cache(enabled: bool):
+    # maxsize=0 descarta cada entrada al guardarla: equivale a verificar siempre la firma
+    auth.claims_cache = TTLCache(maxsize=auth.CLAIMS_CACHE_SIZE if enabled else 0)
+
+async def time_dependency(token: str, iterations: int) -> float:
+    await auth.get_current_user(token, db=None)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await auth.get_current_user(token, db=None)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+async def time_requests(client, headers, requests: int) -> float:
+    (await client.get("/user/profile/", headers=headers)).raise_for_status()
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get("/user/profile/", headers=headers)
+    response.raise_for_status()
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def measure(iterations: int, requests: int):
+    results = {}
+    async with make_client() as client:
+        headers = await login(client, "user1@bench.local")
+        token = headers["Authorization"].split(" ", 1)[1]
+        # Una petición deja el principal en su caché; a partir de ahí no se toca la base
+        (await client.get("/user/profile/", headers=headers)).raise_for_status()
+        for name, enabled in (("jwt.decode", False), ("claims cache", True)):
+            with_claims_cache(enabled)
+            results[name] = (
+                await time_dependency(token, iterations),
+                await time_requests(client, headers, requests),
+            )
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sobrecoste de autenticación por petición")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(trainers=1, users_per_trainer=10, plans_per_trainer=1)
+    results = asyncio.run(measure(args.iterations, args.requests))
+    print(f"{'mode':14} {'get_current_user':>18} {'GET /user/profile/':>20}")
+    for name, (dependency_us, request_us) in results.items():
+        print(f"{name:14} {dependency_us:>15.1f} us {request_us:>17.1f} us")
+    (before, request_before), (after, request_after) = results.values()
+    print(f"auth overhead: {before:.1f} us -> {after:.1f} us ({before / after:.1f}x); "
+          f"request: {request_before:.1f} us -> {request_after:.1f} us")
@@ -0,0 +1,63 @@
+# benchmarks/cold_start.py
+# Tiempo desde que arranca el proceso de uvicorn hasta que /readyz responde 200,
+# y latencia del primer login (con el backend de bcrypt ya precalentado).
+# Uso: python -m benchmarks.cold_start [--runs 3] [--port 8765]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import PASSWORD, ROOT
+from benchmarks.seed import seed
+
+import httpx
+
+def cold_start(port: int, timeout: float = 60.0):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(process.stderr.read().decode())
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError("server did not become ready")
+                try:
+                    response = client.get("/readyz")
+                    if response.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+            ready_seconds = time.perf_counter() - started
+            report = response.json()
+
+            login_started = time.perf_counter()
+            client.post("/token", data={"username": "admin1@bench.local", "password": PASSWORD}).raise_for_status()
+            first_login = time.perf_counter() - login_started
+        return ready_seconds, first_login, report
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío hasta /readyz")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    seed(trainers=1, users_per_trainer=10, plans_per_trainer=5)
+    ready, logins = [], []
+    for run in range(args.runs):
+        ready_seconds, first_login, report = cold_start(args.port)
+        ready.append(ready_seconds)
+        logins.append(first_login)
+        print(f"run {run + 1}: ready {ready_seconds:.2f}s, first login {first_login * 1000:.0f} ms, "
+              f"import {report['import_seconds']}s, startup {report['startup_seconds']}s, "
+              f"steps {report['steps']}, db {report['db_latency_ms']} ms")
+    print(f"median: ready {statistics.median(ready):.2f}s, first login {statistics.median(logins) * 1000:.0f} ms")
@@ -0,0 +1,26 @@
+# benchmarks/common.py
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Por defecto los benchmarks usan una base SQLite local desechable
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# Los benchmarks miden la aplicación, no el limitador: todas las peticiones salen de la misma IP
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+PASSWORD = "password"
+
+def make_client():
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://benchmark")
+
+async def login(client, email: str, password: str = PASSWORD):
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,39 @@
+# benchmarks/export.py
+# Comprueba que la memoria de /admin/export no crece con el tamaño de la tabla.
+# Uso: python -m benchmarks.export [--sizes 10000 100000]
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.seed import seed
+from utils.export import stream_export
+
+async def consume(resource: str, fmt: str):
+    total = 0
+    async for chunk in stream_export(resource, fmt):
+        total += len(chunk)
+    return total
+
+def measure(resource: str, fmt: str):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = asyncio.run(consume(resource, fmt))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria pico de la exportación según el número de filas")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'plans':>7} {'resource':16} {'fmt':6} {'MB out':>7} {'seconds':>8} {'peak MB':>8}")
+    for users in args.sizes:
+        # Dos entrenadores; los planes crecen con los usuarios para ejercitar el join con hijos
+        seed(trainers=2, users_per_trainer=users // 2, plans_per_trainer=users // 20,
+             assignments_per_user=0, routines_per_trainer=0)
+        for resource, fmt in (("users", "ndjson"), ("users", "csv"), ("workout-plans", "ndjson")):
+            size, elapsed, peak = measure(resource, fmt)
+            print(f"{users:8} {users // 10:7} {resource:16} {fmt:6} {size / 1e6:7.1f} {elapsed:8.2f} {peak / 1e6:8.2f}")
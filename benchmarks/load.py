@@ -0,0 +1,464 @@
+# benchmarks/load.py
+# Benchmark de carga reproducible: siembra la base, recorre todos los endpoints con un cliente
+# ASGI en proceso y guarda p50/p95/p99, peticiones por segundo y consultas por petición en JSON.
+# Uso: python -m benchmarks.load [--scale small] [--mode sequential|concurrent|both]
+#                                [--baseline benchmarks/results/anterior.json]
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.common import PASSWORD, ROOT, login, make_client
+from benchmarks.seed import seed
+
+import main
+from config.database import AsyncSessionLocal, DATABASE_URL
+from fastapi.routing import APIRoute
+from utils.metrics import request_metrics
+from utils.reset_tokens import issue_reset_token
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# "realistic": 50 admins, 2k entrenadores, 200k usuarios, 100k planes de cada tipo, 500k ejercicios
+SCALES = {
+    "small": dict(admins=2, trainers=20, users_per_trainer=50, plans_per_trainer=20,
+                  exercises_per_plan=5, meals_per_plan=4, routines_per_trainer=5),
+    "realistic": dict(admins=50, trainers=2000, users_per_trainer=100, plans_per_trainer=50,
+                      exercises_per_plan=5, meals_per_plan=4, routines_per_trainer=20),
+}
+
+PAGE = {"limit": 50}
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, key: str, seconds: float, ok: bool):
+        self.samples.setdefault(key, []).append(seconds)
+        if not ok:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+class Context:
+    # Estado compartido por los flujos: cabeceras por principal y la forma de los datos sembrados
+    def __init__(self, client, recorder, scale, headers, run_id):
+        self.client = client
+        self.recorder = recorder
+        self.scale = scale
+        self.headers = headers
+        self.run_id = run_id
+        self.sequence = 0
+
+    def unique_email(self, prefix: str) -> str:
+        self.sequence += 1
+        return f"{prefix}-{self.run_id}-{self.sequence}@example.com"
+
+    def trainer(self, rng):
+        return rng.choice(self.headers["trainers"])
+
+    def trainer_user_ids(self, trainer_id: int, rng, count: int):
+        per_trainer = self.scale["users_per_trainer"]
+        first = (trainer_id - 1) * per_trainer + 1
+        return rng.sample(range(first, first + per_trainer), min(count, per_trainer))
+
+    async def call(self, method: str, template: str, headers=None, expect=200, path_params=None, **kwargs):
+        # Se agrupa por plantilla de ruta, igual que /metrics, para poder cruzar ambos datos
+        path = template.format(**(path_params or {}))
+        started = time.perf_counter()
+        response = await self.client.request(method, path, headers=headers, **kwargs)
+        await response.aread()
+        elapsed = time.perf_counter() - started
+        self.recorder.record(f"{method} {template}", elapsed, response.status_code == expect)
+        return response
+
+# --- Flujos ----------------------------------------------------------------
+# Cada flujo deja la base como estaba (salvo la importación), así las ejecuciones son comparables
+
+async def public_reads(ctx, rng):
+    await ctx.call("GET", "/")
+    await ctx.call("GET", "/healthz")
+    await ctx.call("GET", "/readyz")
+
+async def login_flow(ctx, rng):
+    user_id = rng.randint(1, ctx.scale["users"])
+    await ctx.call("POST", "/token", data={"username": f"user{user_id}@bench.local", "password": PASSWORD})
+
+async def admin_reads(ctx, rng):
+    headers = ctx.headers["admin"]
+    for template in ("/admin/trainers/", "/admin/users/", "/admin/plans/", "/admin/routines/",
+                     "/admin/workout-plans/", "/admin/nutrition-plans/"):
+        await ctx.call("GET", template, headers=headers, params=PAGE)
+    await ctx.call("GET", "/admin/db-pool", headers=headers)
+    await ctx.call("GET", "/metrics")
+
+async def admin_export(ctx, rng):
+    await ctx.call("GET", "/admin/export/{resource}", headers=ctx.headers["admin"],
+                   path_params={"resource": "trainers"}, params={"format": rng.choice(["ndjson", "csv"])})
+
+async def trainer_reads(ctx, rng):
+    _, headers = ctx.trainer(rng)
+    for template in ("/trainer/users/", "/trainer/plans/", "/trainer/routines/",
+                     "/trainer/workout-plans/", "/trainer/nutrition-plans/"):
+        await ctx.call("GET", template, headers=headers, params=PAGE)
+    await ctx.call("GET", "/trainer/stats", headers=headers)
+
+async def user_reads(ctx, rng):
+    _, headers = rng.choice(ctx.headers["users"])
+    await ctx.call("GET", "/user/profile/", headers=headers)
+    await ctx.call("GET", "/user/plans/", headers=headers)
+
+async def user_profile_update(ctx, rng):
+    user_id, headers = rng.choice(ctx.headers["users"])
+    await ctx.call("PUT", "/user/profile/", headers=headers,
+                   json={"email": f"user{user_id}@bench.local", "full_name": f"User {user_id}"})
+
+async def _plan_lifecycle(ctx, rng, kind: str, children: str, make_child):
+    trainer_id, headers = ctx.trainer(rng)
+    base = f"/trainer/{kind}-plans/"
+    body = {"name": "Load plan", "description": "load test",
+            children: [make_child(n) for n in range(4)]}
+    plan = (await ctx.call("POST", base, headers=headers, json=body)).json()
+
+    # Un hijo modificado, uno eliminado y uno nuevo: ejercita el diff completo
+    items = [dict(item) for item in plan[children][:3]]
+    items[0]["name"] = "Changed"
+    items.append(make_child(9))
+    await ctx.call("PUT", base + "{plan_id}", headers=headers, path_params={"plan_id": plan["id"]},
+                   json={"name": plan["name"], "description": plan["description"], children: items})
+
+    clones = (await ctx.call("POST", base + "{plan_id}/clone", headers=headers,
+                             path_params={"plan_id": plan["id"]}, params={"count": 2})).json()
+    plan_ids = [plan["id"]] + [clone["id"] for clone in clones]
+
+    user_ids = ctx.trainer_user_ids(trainer_id, rng, 3)
+    await ctx.call("POST", f"/trainer/assign-{kind}/{{user_id}}/{{plan_id}}", headers=headers,
+                   path_params={"user_id": user_ids[0], "plan_id": plan["id"]})
+    await ctx.call("POST", f"/trainer/assign-{kind}/bulk", headers=headers,
+                   json={"user_ids": user_ids, "plan_ids": plan_ids})
+
+    for plan_id in plan_ids:
+        await ctx.call("DELETE", base + "{plan_id}", headers=headers, path_params={"plan_id": plan_id})
+
+async def workout_lifecycle(ctx, rng):
+    await _plan_lifecycle(ctx, rng, "workout", "exercises",
+                          lambda n: {"name": f"Exercise {n}", "sets": 3, "reps": 10})
+
+async def nutrition_lifecycle(ctx, rng):
+    await _plan_lifecycle(ctx, rng, "nutrition", "meals",
+                          lambda n: {"name": f"Meal {n}", "description": None, "calories": 500})
+
+async def trainer_routine_lifecycle(ctx, rng):
+    _, headers = ctx.trainer(rng)
+    body = {"name": "Load routine", "description": None,
+            "exercises": [{"name": "Squat", "sets": 5, "reps": 5}]}
+    routine = (await ctx.call("POST", "/trainer/routines/", headers=headers, json=body)).json()
+    path_params = {"routine_id": routine["id"]}
+    await ctx.call("PUT", "/trainer/routines/{routine_id}", headers=headers, path_params=path_params,
+                   json={"name": "Load routine 2", "exercises": [{"name": "Squat", "sets": 3, "reps": 8}]})
+    await ctx.call("DELETE", "/trainer/routines/{routine_id}", headers=headers, path_params=path_params)
+
+async def admin_routine_lifecycle(ctx, rng):
+    routine = (await ctx.call("POST", "/admin/routines/", headers=ctx.headers["admin"],
+                              json={"name": "Load routine", "exercises": [{"name": "Squat", "sets": 3, "reps": 10}]})).json()
+    path_params = {"routine_id": routine["id"]}
+    await ctx.call("PUT", "/admin/routines/{routine_id}", headers=ctx.headers["admin"], path_params=path_params,
+                   json={"name": "Load routine 2", "exercises": [{"name": "Lunge", "sets": 3, "reps": 12}]})
+    await ctx.call("DELETE", "/admin/routines/{routine_id}", headers=ctx.headers["admin"], path_params=path_params)
+
+async def _create_user(ctx, headers):
+    email = ctx.unique_email("user")
+    user = (await ctx.call("POST", "/trainer/users/", headers=headers,
+                           json={"email": email, "full_name": "Load User", "password": PASSWORD})).json()
+    return user
+
+async def trainer_user_lifecycle(ctx, rng):
+    _, headers = ctx.trainer(rng)
+    user = await _create_user(ctx, headers)
+    path_params = {"user_id": user["id"]}
+    # Esta ruta valida con UserCreate: la contraseña es obligatoria y se vuelve a hashear
+    await ctx.call("PUT", "/trainer/users/{user_id}", headers=headers, path_params=path_params,
+                   json={"email": user["email"], "full_name": "Load User 2", "password": PASSWORD})
+    await ctx.call("DELETE", "/trainer/users/{user_id}", headers=headers, path_params=path_params)
+
+async def admin_user_lifecycle(ctx, rng):
+    trainer_id, headers = ctx.trainer(rng)
+    user = await _create_user(ctx, headers)
+    path_params = {"user_id": user["id"]}
+    await ctx.call("PUT", "/admin/users/{user_id}", headers=ctx.headers["admin"], path_params=path_params,
+                   json={"email": user["email"], "full_name": "Load User 2", "trainer_id": trainer_id})
+    await ctx.call("DELETE", "/admin/users/{user_id}", headers=ctx.headers["admin"], path_params=path_params)
+
+async def user_import(ctx, rng):
+    # Los usuarios importados se quedan en la base; son pocos frente al volumen sembrado
+    _, headers = ctx.trainer(rng)
+    lines = ["email,full_name,password"] + [
+        f"{ctx.unique_email('import')},Imported User,{PASSWORD}" for _ in range(2)
+    ]
+    await ctx.call("POST", "/trainer/users/import", headers={**headers, "Content-Type": "text/csv"},
+                   content="\n".join(lines).encode())
+
+async def password_reset(ctx, rng):
+    _, headers = ctx.trainer(rng)
+    user = await _create_user(ctx, headers)
+    await ctx.call("POST", "/admin/request-password-reset/", json={"email": user["email"]})
+    # El token real solo viaja por correo; se emite otro directamente para completar el flujo
+    async with AsyncSessionLocal() as db:
+        token = await issue_reset_token(db, user["email"])
+        await db.commit()
+    await ctx.call("POST", "/admin/reset-password/", json={"token": token, "new_password": PASSWORD})
+    await ctx.call("DELETE", "/trainer/users/{user_id}", headers=headers, path_params={"user_id": user["id"]})
+
+async def admin_trainer_lifecycle(ctx, rng):
+    headers = ctx.headers["admin"]
+    email = ctx.unique_email("trainer")
+    trainer = (await ctx.call("POST", "/admin/trainers/", headers=headers,
+                              json={"email": email, "full_name": "Load Trainer", "password": PASSWORD})).json()
+    path_params = {"trainer_id": trainer["id"]}
+    await ctx.call("PUT", "/admin/trainers/{trainer_id}", headers=headers, path_params=path_params,
+                   json={"email": email, "full_name": "Load Trainer 2"})
+    await ctx.call("DELETE", "/admin/trainers/{trainer_id}", headers=headers, path_params=path_params)
+
+async def admin_admin_lifecycle(ctx, rng):
+    headers = ctx.headers["admin"]
+    email = ctx.unique_email("admin")
+    admin = (await ctx.call("POST", "/admin/create-admin/", headers=headers,
+                            json={"email": email, "full_name": "Load Admin", "password": PASSWORD})).json()
+    path_params = {"admin_id": admin["id"]}
+    await ctx.call("PUT", "/admin/admin/{admin_id}", headers=headers, path_params=path_params,
+                   json={"email": email, "full_name": "Load Admin 2"})
+    await ctx.call("DELETE", "/admin/admin/{admin_id}", headers=headers, path_params=path_params)
+
+# (flujo, peso en el modo concurrente): sobre todo lecturas, como el tráfico real
+FLOWS = [
+    (public_reads, 2),
+    (login_flow, 3),
+    (admin_reads, 2),
+    (admin_export, 1),
+    (trainer_reads, 20),
+    (user_reads, 30),
+    (user_profile_update, 3),
+    (workout_lifecycle, 3),
+    (nutrition_lifecycle, 3),
+    (trainer_routine_lifecycle, 2),
+    (admin_routine_lifecycle, 1),
+    (trainer_user_lifecycle, 2),
+    (admin_user_lifecycle, 1),
+    (user_import, 1),
+    (password_reset, 1),
+    (admin_trainer_lifecycle, 1),
+    (admin_admin_lifecycle, 1),
+]
+
+# --- Informe ---------------------------------------------------------------
+
+def percentile(sorted_values, fraction: float) -> float:
+    # Rango más cercano: siempre devuelve una muestra real
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder: Recorder, elapsed: float):
+    server = {f"{method} {template}": metrics for (method, template), metrics in request_metrics.routes.items()}
+    endpoints = {}
+    for key, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        queries = server.get(key)
+        query_stats = queries.queries.snapshot() if queries else None
+        endpoints[key] = {
+            "requests": len(ordered),
+            "errors": recorder.errors.get(key, 0),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+            "queries_per_request": (
+                round(query_stats["sum"] / query_stats["count"], 2) if query_stats and query_stats["count"] else None
+            ),
+        }
+    everything = sorted(value for samples in recorder.samples.values() for value in samples)
+    total = {
+        "requests": len(everything),
+        "errors": sum(recorder.errors.values()),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(everything) / elapsed, 1) if elapsed else None,
+    }
+    if everything:
+        total.update({
+            "p50_ms": round(percentile(everything, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(everything, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(everything, 0.99) * 1000, 3),
+        })
+    return {"total": total, "endpoints": endpoints}
+
+def uncovered_routes(results) -> list:
+    # Rutas de la app que ningún flujo ha tocado: un endpoint nuevo debe añadirse a FLOWS
+    covered = set()
+    for phase in results.values():
+        covered.update(phase["endpoints"])
+    routes = {
+        f"{method} {route.path}"
+        for route in main.app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    return sorted(routes - covered)
+
+def print_phase(name: str, phase):
+    total = phase["total"]
+    print(f"\n== {name}: {total['requests']} requests, {total['rps']} req/s, {total['errors']} errors")
+    print(f"{'endpoint':50} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'q/req':>6}")
+    for key, stats in phase["endpoints"].items():
+        queries = "-" if stats["queries_per_request"] is None else stats["queries_per_request"]
+        print(f"{key:50} {stats['requests']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+              f"{stats['p99_ms']:>9.2f} {queries:>6}" + (f"  ({stats['errors']} errors)" if stats["errors"] else ""))
+
+def compare(report, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n== p95 vs {baseline_path}")
+    for name, phase in report["results"].items():
+        old_phase = baseline.get("results", {}).get(name)
+        if not old_phase:
+            continue
+        for key, stats in phase["endpoints"].items():
+            old = old_phase["endpoints"].get(key)
+            if not old:
+                continue
+            change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+            queries = ""
+            if stats["queries_per_request"] != old["queries_per_request"]:
+                queries = f"  queries {old['queries_per_request']} -> {stats['queries_per_request']}"
+            print(f"{name:10} {key:50} {old['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ({change:+.1f}%){queries}")
+        old_rps, rps = old_phase["total"]["rps"], phase["total"]["rps"]
+        print(f"{name:10} {'total req/s':50} {old_rps} -> {rps}")
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- Ejecución -------------------------------------------------------------
+
+async def run_sequential(ctx, iterations: int, seed_value: int):
+    # Cada flujo por separado: latencias sin contención, útiles para comparar endpoint a endpoint
+    rng = random.Random(seed_value)
+    for flow, _ in FLOWS:
+        for _ in range(iterations):
+            await flow(ctx, rng)
+
+async def run_concurrent(ctx, concurrency: int, duration: float, seed_value: int):
+    # Mezcla ponderada con N trabajadores; cada uno con su propio generador sembrado
+    flows, weights = zip(*FLOWS)
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int):
+        rng = random.Random(seed_value * 1000 + index)
+        while time.perf_counter() < deadline:
+            await rng.choices(flows, weights)[0](ctx, rng)
+
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+
+async def measure(args, scale):
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        async with make_client() as client:
+            rng = random.Random(args.seed)
+            trainer_ids = rng.sample(range(1, scale["trainers"] + 1), min(args.principals, scale["trainers"]))
+            user_ids = rng.sample(range(1, scale["users"] + 1), min(args.principals, scale["users"]))
+            headers = {
+                "admin": await login(client, "admin1@bench.local"),
+                "trainers": [(i, await login(client, f"trainer{i}@bench.local")) for i in trainer_ids],
+                "users": [(i, await login(client, f"user{i}@bench.local")) for i in user_ids],
+            }
+            run_id = uuid.uuid4().hex[:8]
+
+            # Calentamiento: una pasada por cada flujo, fuera de las mediciones
+            warmup = Context(client, Recorder(), scale, headers, run_id)
+            await run_sequential(warmup, 1, args.seed)
+
+            phases = []
+            if args.mode in ("sequential", "both"):
+                phases.append(("sequential", lambda ctx: run_sequential(ctx, args.iterations, args.seed)))
+            if args.mode in ("concurrent", "both"):
+                phases.append(("concurrent", lambda ctx: run_concurrent(ctx, args.concurrency, args.duration, args.seed)))
+
+            for name, phase in phases:
+                request_metrics.routes.clear()
+                ctx = Context(client, Recorder(), scale, headers, run_id)
+                ctx.sequence = warmup.sequence + len(results) * 1_000_000
+                started = time.perf_counter()
+                await phase(ctx)
+                results[name] = summarize(ctx.recorder, time.perf_counter() - started)
+    return results
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de todos los endpoints")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="realistic")
+    parser.add_argument("--reuse", action="store_true", help="no volver a sembrar la base")
+    parser.add_argument("--mode", choices=("sequential", "concurrent", "both"), default="both")
+    parser.add_argument("--iterations", type=int, default=20, help="repeticiones por flujo (secuencial)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos (concurrente)")
+    parser.add_argument("--principals", type=int, default=5, help="entrenadores y usuarios con sesión")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="ruta del JSON (por defecto benchmarks/results/load-<fecha>.json)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    scale["users"] = scale["trainers"] * scale["users_per_trainer"]
+    counts = None
+    if not args.reuse:
+        started = time.perf_counter()
+        counts = seed(**{key: value for key, value in scale.items() if key != "users"})
+        print(f"seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+    results = asyncio.run(measure(args, scale))
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_revision": git_revision(),
+            "database": DATABASE_URL.split("://")[0],
+            "python": platform.python_version(),
+            "scale": args.scale,
+            "seeded": counts,
+            "mode": args.mode,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "principals": args.principals,
+            "seed": args.seed,
+            "fast_json": os.getenv("FAST_JSON"),
+        },
+        "results": results,
+        "uncovered_routes": uncovered_routes(results),
+    }
+
+    for name, phase in results.items():
+        print_phase(name, phase)
+    if report["uncovered_routes"]:
+        print("\nnot exercised:", ", ".join(report["uncovered_routes"]))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {output}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+    errors = sum(phase["total"]["errors"] for phase in results.values())
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,56 @@
+# benchmarks/query_counts.py
+# Fija cada listado a un número constante de sentencias sin importar el tamaño de página.
+# Uso: python -m benchmarks.query_counts
+import asyncio
+import sys
+
+from benchmarks.common import login, make_client
+from benchmarks.seed import seed
+from config.database import async_engine
+from utils.metrics import count_queries
+
+PAGE_SIZES = (1, 10, 100)
+
+# (rol, ruta, máximo de sentencias permitido); las rutas de entrenador y usuario leen además su versión
+ENDPOINTS = [
+    ("admin", "/admin/trainers/", 1),
+    ("admin", "/admin/users/", 1),
+    ("admin", "/admin/plans/", 1),
+    ("admin", "/admin/routines/", 1),
+    ("admin", "/admin/workout-plans/", 2),
+    ("admin", "/admin/nutrition-plans/", 2),
+    ("trainer", "/trainer/users/", 2),
+    ("trainer", "/trainer/plans/", 2),
+    ("trainer", "/trainer/routines/", 2),
+    ("trainer", "/trainer/workout-plans/", 3),
+    ("trainer", "/trainer/nutrition-plans/", 3),
+    ("user", "/user/plans/", 5),
+]
+
+async def measure():
+    failures = []
+    async with make_client() as client:
+        headers = {
+            "admin": await login(client, "admin1@bench.local"),
+            "trainer": await login(client, "trainer1@bench.local"),
+            "user": await login(client, "user1@bench.local"),
+        }
+        for role, path, max_statements in ENDPOINTS:
+            # Primera petición para calentar la caché de principales
+            (await client.get(path, headers=headers[role])).raise_for_status()
+            counts = []
+            for size in PAGE_SIZES:
+                with count_queries(async_engine) as counter:
+                    response = await client.get(path, params={"limit": size}, headers=headers[role])
+                response.raise_for_status()
+                counts.append(counter.count)
+            ok = len(set(counts)) == 1 and counts[0] <= max_statements
+            print(f"{'ok  ' if ok else 'FAIL'} {path:30} {counts} (max {max_statements})")
+            if not ok:
+                failures.append(path)
+    return failures
+
+if __name__ == "__main__":
+    seed()
+    failures = asyncio.run(measure())
+    sys.exit(1 if failures else 0)
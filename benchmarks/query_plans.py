@@ -0,0 +1,122 @@
+# benchmarks/query_plans.py
+# Ejecuta las consultas reales de las rutas sobre datos sembrados, guarda su EXPLAIN
+# y falla si alguna hace un recorrido completo o un ordenamiento externo (filesort).
+# Uso: python -m benchmarks.query_plans [--verbose]
+import argparse
+import asyncio
+import re
+import sys
+
+from benchmarks.common import login, make_client
+from benchmarks.seed import seed
+from config.database import async_engine, engine
+from utils.metrics import count_queries
+
+# (rol, método, ruta, kwargs de la petición, tablas en las que se admite recorrer entero)
+# Los listados de admin y la exportación recorren la tabla por clave primaria a propósito
+CASES = [
+    ("admin", "GET", "/admin/trainers/", {"params": {"limit": 50}}, {"trainers"}),
+    ("admin", "GET", "/admin/users/", {"params": {"limit": 50}}, {"users"}),
+    ("admin", "GET", "/admin/plans/", {"params": {"limit": 50}}, {"workout_plans"}),
+    ("admin", "GET", "/admin/routines/", {"params": {"limit": 50}}, {"routines"}),
+    ("admin", "GET", "/admin/workout-plans/", {"params": {"limit": 50}}, {"workout_plans"}),
+    ("admin", "GET", "/admin/nutrition-plans/", {"params": {"limit": 50}}, {"nutrition_plans"}),
+    ("admin", "GET", "/admin/export/users", {"params": {"format": "csv"}}, {"users"}),
+    ("admin", "GET", "/admin/export/workout-plans", {}, {"workout_plans"}),
+    ("trainer", "GET", "/trainer/users/", {"params": {"limit": 50}}, set()),
+    ("trainer", "GET", "/trainer/users/", {"params": {"limit": 50, "cursor": "eyJpZCI6MjB9"}}, set()),
+    ("trainer", "GET", "/trainer/plans/", {"params": {"limit": 50}}, set()),
+    ("trainer", "GET", "/trainer/routines/", {"params": {"limit": 50}}, set()),
+    ("trainer", "GET", "/trainer/workout-plans/", {"params": {"limit": 50}}, set()),
+    ("trainer", "GET", "/trainer/nutrition-plans/", {"params": {"limit": 50}}, set()),
+    ("trainer", "PUT", "/trainer/workout-plans/1",
+     {"json": {"name": "Workout 1", "description": "Seeded plan",
+               "exercises": [{"name": "Exercise 0", "sets": 4, "reps": 10}]}}, set()),
+    ("trainer", "PUT", "/trainer/nutrition-plans/1",
+     {"json": {"name": "Nutrition 1", "description": "Seeded plan",
+               "meals": [{"name": "Meal 0", "calories": 500}]}}, set()),
+    ("trainer", "POST", "/trainer/workout-plans/2/clone", {"params": {"count": 3}}, set()),
+    ("trainer", "POST", "/trainer/assign-workout/bulk", {"json": {"user_ids": [1, 2, 3], "plan_ids": [4, 5]}}, set()),
+    ("trainer", "POST", "/trainer/assign-nutrition/5/6", {}, set()),
+    ("trainer", "DELETE", "/trainer/workout-plans/3", {}, set()),
+    ("user", "GET", "/user/plans/", {}, set()),
+    ("user", "GET", "/user/profile/", {}, set()),
+]
+
+SKIP = re.compile(r"^\s*(INSERT INTO \w+ \([^)]*\) VALUES|BEGIN|COMMIT|ROLLBACK|SELECT 1\b)", re.I)
+
+def explain(statement, parameters):
+    # Se repite la sentencia con el driver sync: mismo paramstyle que su par asyncio
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN " + statement, parameters)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        connection.rollback()
+        connection.close()
+
+def problems(plan, allow_scan):
+    found = []
+    if engine.dialect.name == "sqlite":
+        for detail in plan:
+            scan = re.match(r"SCAN (\w+)", detail)
+            if scan and scan.group(1) not in allow_scan:
+                found.append(f"full scan: {detail}")
+            if "USE TEMP B-TREE" in detail:
+                found.append(f"filesort: {detail}")
+    else:
+        for row in plan:
+            if row.get("type") in ("ALL", "index") and row.get("table") not in allow_scan:
+                found.append(f"full scan: {row.get('table')} ({row.get('type')})")
+            if "filesort" in (row.get("Extra") or ""):
+                found.append(f"filesort: {row.get('table')} ({row.get('Extra')})")
+    return found
+
+async def run(verbose: bool):
+    failures = 0
+    async with make_client() as client:
+        headers = {
+            "admin": await login(client, "admin1@bench.local"),
+            "trainer": await login(client, "trainer1@bench.local"),
+            "user": await login(client, "user1@bench.local"),
+        }
+        for role, method, path, kwargs, allow_scan in CASES:
+            with count_queries(async_engine) as counter:
+                response = await client.request(method, path, headers=headers[role], **kwargs)
+            response.raise_for_status()
+            seen = set()
+            for statement, parameters, executemany in counter.executions:
+                if executemany or SKIP.match(statement) or statement in seen:
+                    continue
+                seen.add(statement)
+                plan = explain(statement, parameters)
+                found = problems(plan, allow_scan)
+                failures += bool(found)
+                if found or verbose:
+                    print(f"{'FAIL' if found else 'ok  '} {method} {path}")
+                    print("     " + " ".join(statement.split())[:300])
+                    for line in plan:
+                        print(f"       {line}")
+                    for problem in found:
+                        print(f"     -> {problem}")
+            if not verbose:
+                print(f"done {method} {path}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas de las rutas")
+    parser.add_argument("--verbose", action="store_true", help="muestra también los planes correctos")
+    args = parser.parse_args()
+
+    seed()
+    with engine.begin() as conn:
+        # Estadísticas para que el planificador elija como lo haría en producción
+        conn.exec_driver_sql("ANALYZE" if engine.dialect.name == "sqlite" else "ANALYZE TABLE users, trainers, workout_plans, nutrition_plans, exercises, meals, routines, accounts, user_workout_plans, user_nutrition_plans")
+    failures = asyncio.run(run(args.verbose))
+    print(f"{failures} statement(s) with full scans or filesorts")
+    sys.exit(1 if failures else 0)
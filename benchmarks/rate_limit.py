@@ -0,0 +1,75 @@
+# benchmarks/rate_limit.py
+# Comprobaciones del limitador de intentos: de qué IP se toma la clave detrás de proxies, que los
+# logins correctos no gastan el límite por IP y que Retry-After basta para volver a ser admitido.
+# Uso: python -m benchmarks.rate_limit
+import asyncio
+import os
+import sys
+
+# Límite por IP bajo para que la prueba de logins no dependa de decenas de hashes bcrypt
+os.environ["RATE_LIMIT_ENABLED"] = "true"
+os.environ.setdefault("LOGIN_RATE_LIMIT_IP", "5")
+os.environ.setdefault("LOGIN_RATE_LIMIT_EMAIL", "1000")
+
+from benchmarks.common import login, make_client
+from benchmarks.seed import seed
+from starlette.requests import Request
+
+from utils.rate_limit import RATE_LIMITS, client_ip, sliding_window
+
+def make_request(forwarded: str | None = None, peer: str = "10.0.0.1") -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+def check_forwarded():
+    # (descripción, resultado, esperado)
+    yield "sin proxies se ignora la cabecera", client_ip(make_request("1.1.1.1"), 0), "10.0.0.1"
+    yield "un proxy: entrada de la derecha", client_ip(make_request("203.0.113.7"), 1), "203.0.113.7"
+    for spoofed in ("6.6.6.6", "7.7.7.7, 8.8.8.8"):
+        yield (f"un proxy: '{spoofed}' falsificado a la izquierda no cambia la clave",
+               client_ip(make_request(f"{spoofed}, 203.0.113.7"), 1), "203.0.113.7")
+        yield (f"dos proxies: '{spoofed}' falsificado a la izquierda no cambia la clave",
+               client_ip(make_request(f"{spoofed}, 203.0.113.7, 10.1.1.1"), 2), "203.0.113.7")
+    yield "menos entradas que proxies: IP de la conexión", client_ip(make_request("203.0.113.7"), 2), "10.0.0.1"
+
+def check_retry_after():
+    # Llena la ventana con distintos ritmos y comprueba que al esperar el Retry-After devuelto
+    # la siguiente petición se admite y que no sobra espera (el redondeo hacia arriba añade <1 s)
+    for limit, window in ((1, 60), (3, 60), (10, 60), (30, 60), (10, 900)):
+        for previous in (0, limit // 2, limit):
+            for offset in (0.0, 0.3 * window, 0.9 * window):
+                now = 10 * window + offset
+                state = (10, 0, previous)
+                while True:
+                    *state, retry_after = sliding_window(now, window, limit, *state)
+                    if retry_after is not None:
+                        break
+                *_, admitted = sliding_window(now + retry_after, window, limit, *state)
+                *_, early = sliding_window(now + max(0, retry_after - 2), window, limit, *state)
+                yield (f"limit={limit} window={window} previous={previous} offset={offset:.0f}: "
+                       f"Retry-After={retry_after}", (admitted is None, early is not None), (True, True))
+
+async def check_login_burst():
+    # Todos los logins salen de la misma IP, como detrás de una NAT
+    limit = RATE_LIMITS["login:ip"][0]
+    async with make_client() as client:
+        for _ in range(limit * 2):
+            await login(client, "user1@bench.local")
+        statuses = [
+            (await client.post("/token", data={"username": f"nobody{i}@bench.local", "password": "x"})).status_code
+            for i in range(limit + 1)
+        ]
+    return [
+        (f"{limit * 2} logins correctos seguidos no agotan el límite por IP", True, True),
+        (f"los fallidos sí cuentan: {limit} x 401 y luego 429", statuses, [401] * limit + [429]),
+    ]
+
+if __name__ == "__main__":
+    seed(trainers=1, users_per_trainer=2, plans_per_trainer=1)
+    checks = [*check_forwarded(), *check_retry_after(), *asyncio.run(check_login_burst())]
+    failures = 0
+    for name, result, expected in checks:
+        ok = result == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {result!r}" + ("" if ok else f" (esperado {expected!r})"))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,143 @@
+# benchmarks/seed.py
+import argparse
+import time
+
+from benchmarks.common import PASSWORD
+from sqlalchemy import insert
+
+from config.database import engine
+import models.models as models
+from utils.auth import get_password_hash
+
+CHUNK = 5000
+
+class _Writer:
+    # Acumula filas por tabla y las vuelca en bloques; el orden de TABLES respeta las FK
+    def __init__(self, conn, tables):
+        self.conn = conn
+        self.tables = tables
+        self.rows = {table: [] for table in tables}
+        self.counts = {table: 0 for table in tables}
+
+    def add(self, table, row):
+        self.rows[table].append(row)
+        if len(self.rows[table]) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        for table in self.tables:
+            rows = self.rows[table]
+            if rows:
+                self.conn.execute(insert(table), rows)
+                self.counts[table] += len(rows)
+                self.rows[table] = []
+
+def seed(
+    admins: int = 1,
+    trainers: int = 2,
+    users_per_trainer: int = 150,
+    plans_per_trainer: int = 120,
+    exercises_per_plan: int = 5,
+    meals_per_plan: int = 4,
+    routines_per_trainer: int = 20,
+    assignments_per_user: int = 2,
+):
+    # Recrea el esquema y lo llena con ids explícitos para no tener que leerlos de vuelta.
+    # Las filas se generan por entrenador para que la memoria no crezca con el volumen
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    hashed = get_password_hash(PASSWORD)
+
+    tables = [
+        models.Admin.__table__,
+        models.Trainer.__table__,
+        models.User.__table__,
+        models.Account.__table__,
+        models.WorkoutPlan.__table__,
+        models.NutritionPlan.__table__,
+        models.Routine.__table__,
+        models.Exercise.__table__,
+        models.Meal.__table__,
+        models.user_workout_plans,
+        models.user_nutrition_plans,
+    ]
+    (admin_table, trainer_table, user_table, account_table, workout_table, nutrition_table,
+     routine_table, exercise_table, meal_table, workout_links, nutrition_links) = tables
+
+    with engine.begin() as conn:
+        writer = _Writer(conn, tables)
+        for admin_id in range(1, admins + 1):
+            email = f"admin{admin_id}@bench.local"
+            writer.add(admin_table, {"id": admin_id, "email": email, "hashed_password": hashed,
+                                     "full_name": f"Admin {admin_id}"})
+            writer.add(account_table, {"email": email, "role": "admin", "principal_id": admin_id})
+
+        for trainer_id in range(1, trainers + 1):
+            email = f"trainer{trainer_id}@bench.local"
+            writer.add(trainer_table, {"id": trainer_id, "email": email, "hashed_password": hashed,
+                                       "full_name": f"Trainer {trainer_id}",
+                                       "admin_id": (trainer_id - 1) % admins + 1})
+            writer.add(account_table, {"email": email, "role": "trainer", "principal_id": trainer_id})
+
+            first_plan = (trainer_id - 1) * plans_per_trainer + 1
+            plan_ids = range(first_plan, first_plan + plans_per_trainer)
+            for plan_id in plan_ids:
+                writer.add(workout_table, {"id": plan_id, "name": f"Workout {plan_id}",
+                                           "description": "Seeded plan", "trainer_id": trainer_id})
+                writer.add(nutrition_table, {"id": plan_id, "name": f"Nutrition {plan_id}",
+                                             "description": "Seeded plan", "trainer_id": trainer_id})
+                for n in range(exercises_per_plan):
+                    writer.add(exercise_table, {"name": f"Exercise {n}", "sets": 3, "reps": 10,
+                                                "workout_plan_id": plan_id})
+                for n in range(meals_per_plan):
+                    writer.add(meal_table, {"name": f"Meal {n}", "description": None, "calories": 400,
+                                            "nutrition_plan_id": plan_id})
+
+            first_routine = (trainer_id - 1) * routines_per_trainer + 1
+            for routine_id in range(first_routine, first_routine + routines_per_trainer):
+                writer.add(routine_table, {"id": routine_id, "name": f"Routine {routine_id}",
+                                           "description": None, "trainer_id": trainer_id})
+
+            first_user = (trainer_id - 1) * users_per_trainer + 1
+            for user_id in range(first_user, first_user + users_per_trainer):
+                email = f"user{user_id}@bench.local"
+                writer.add(user_table, {"id": user_id, "email": email, "hashed_password": hashed,
+                                        "full_name": f"User {user_id}", "trainer_id": trainer_id})
+                writer.add(account_table, {"email": email, "role": "user", "principal_id": user_id})
+                for n in range(min(assignments_per_user, plans_per_trainer)):
+                    plan_id = plan_ids[(user_id + n) % plans_per_trainer]
+                    writer.add(workout_links, {"user_id": user_id, "workout_plan_id": plan_id})
+                    writer.add(nutrition_links, {"user_id": user_id, "nutrition_plan_id": plan_id})
+        writer.flush()
+
+    counts = writer.counts
+    return {
+        "admins": counts[admin_table],
+        "trainers": counts[trainer_table],
+        "users": counts[user_table],
+        "workout_plans": counts[workout_table],
+        "nutrition_plans": counts[nutrition_table],
+        "routines": counts[routine_table],
+        "exercises": counts[exercise_table],
+        "meals": counts[meal_table],
+        "assignments": counts[workout_links] + counts[nutrition_links],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Llena la base de benchmark con datos sintéticos")
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--trainers", type=int, default=2)
+    parser.add_argument("--users-per-trainer", type=int, default=150)
+    parser.add_argument("--plans-per-trainer", type=int, default=120)
+    parser.add_argument("--exercises-per-plan", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(
+        admins=args.admins,
+        trainers=args.trainers,
+        users_per_trainer=args.users_per_trainer,
+        plans_per_trainer=args.plans_per_trainer,
+        exercises_per_plan=args.exercises_per_plan,
+    )
+    print(counts, f"{time.perf_counter() - started:.1f}s")
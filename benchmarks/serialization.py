@@ -0,0 +1,82 @@
+# benchmarks/serialization.py
+# CPU por página de 100 elementos con la serialización por defecto y con FAST_JSON=1.
+# Cada modo corre en un proceso aparte porque FAST_JSON se lee al importar la app.
+# Uso: python -m benchmarks.serialization [--requests 50]
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+PAGE_SIZE = 100
+
+ENDPOINTS = [
+    ("admin", "/admin/users/"),
+    ("admin", "/admin/trainers/"),
+    ("admin", "/admin/plans/"),
+    ("admin", "/admin/workout-plans/"),
+    ("admin", "/admin/nutrition-plans/"),
+    ("trainer", "/trainer/workout-plans/"),
+]
+
+async def measure(requests: int):
+    from benchmarks.common import login, make_client
+    from utils.pagination import NEXT_CURSOR_HEADER
+
+    results = {}
+    async with make_client() as client:
+        headers = {
+            "admin": await login(client, "admin1@bench.local"),
+            "trainer": await login(client, "trainer1@bench.local"),
+        }
+        for role, path in ENDPOINTS:
+            params = {"limit": PAGE_SIZE}
+            (await client.get(path, params=params, headers=headers[role])).raise_for_status()
+            started = time.process_time()
+            for _ in range(requests):
+                response = await client.get(path, params=params, headers=headers[role])
+            cpu_ms = (time.process_time() - started) / requests * 1000
+            response.raise_for_status()
+            results[path] = {
+                "cpu_ms": cpu_ms,
+                "body_sha256": hashlib.sha256(response.content).hexdigest(),
+                "next_cursor": response.headers.get(NEXT_CURSOR_HEADER),
+            }
+    return results
+
+def run_mode(fast: bool, requests: int):
+    env = dict(os.environ, FAST_JSON="1" if fast else "0")
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.serialization", "--child", "--requests", str(requests)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la CPU por página con y sin FAST_JSON")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.requests))))
+        sys.exit(0)
+
+    from benchmarks.common import ROOT  # noqa: F401  (fija DATABASE_URL por defecto)
+    from benchmarks.seed import seed
+    seed()
+
+    default, fast = run_mode(False, args.requests), run_mode(True, args.requests)
+    mismatches = []
+    print(f"{'endpoint':28} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for _, path in ENDPOINTS:
+        before, after = default[path], fast[path]
+        same = (before["body_sha256"], before["next_cursor"]) == (after["body_sha256"], after["next_cursor"])
+        if not same:
+            mismatches.append(path)
+        print(f"{path:28} {before['cpu_ms']:11.2f} {after['cpu_ms']:9.2f} "
+              f"{before['cpu_ms'] / after['cpu_ms']:7.2f}x{'' if same else '  DIFFERENT BODY'}")
+    sys.exit(1 if mismatches else 0)
@@ -1,17 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import os
+import secrets
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import List
 from routes import admin, trainer, user
-from config.database import get_db, engine, SessionLocal
+from config.database import get_async_db, async_engine, AsyncSessionLocal, pool_status
 import models.models as models
 import schemas.schemas as schemas
 from utils.auth import *
+from utils.accounts import backfill_accounts, resolve_account
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.fast_json import DefaultResponse
+from utils.rate_limit import clear_rate_limit, enforce_rate_limit
+from utils.metrics import RequestMetricsMiddleware, render_prometheus
+from utils.hashing import hashing_stats
+from utils.token_versions import token_version_cache
+from utils.user_plans import user_plans_cache
+from utils.reset_tokens import sweep_reset_tokens_forever
+from utils.trainer_stats import reconcile_trainer_stats_forever
+from utils.outbox import run_outbox_sender
+from utils.lifecycle import (
+    check_database, ensure_schema, startup_report, timed_step, warm_bcrypt, warm_pool, with_db_retries
+)
 
-# Crear todas las tablas
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 # Configuración de CORS
 origins = [
@@ -19,7 +41,41 @@ origins = [
     "http://localhost:3000",
 ]
 
-app = FastAPI(title="Fitness API")
+# Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+async def sync_accounts():
+    async with AsyncSessionLocal() as db:
+        await backfill_accounts(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Todo el trabajo contra la base se hace aquí, una vez por proceso, y no al importar
+    started = time.perf_counter()
+    await timed_step("schema", lambda: with_db_retries(ensure_schema))
+    await timed_step("accounts", lambda: with_db_retries(sync_accounts))
+    await timed_step("pool", lambda: with_db_retries(warm_pool))
+    await timed_step("bcrypt", warm_bcrypt)
+
+    # Barrido periódico de tokens de reseteo expirados y envío de la cola de correo
+    background_tasks = [
+        asyncio.create_task(sweep_reset_tokens_forever()),
+        asyncio.create_task(run_outbox_sender()),
+        asyncio.create_task(reconcile_trainer_stats_forever()),
+    ]
+    startup_report["startup_seconds"] = round(time.perf_counter() - started, 4)
+    startup_report["ready"] = True
+    logger.info("Startup finished: %s", startup_report)
+    try:
+        yield
+    finally:
+        startup_report["ready"] = False
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await async_engine.dispose()
+
+app = FastAPI(title="Fitness API", default_response_class=DefaultResponse, lifespan=lifespan)
 
 # Middleware CORS
 app.add_middleware(
@@ -28,41 +84,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Latencia y SQL por ruta; se añade la última para quedar por fuera y medir la petición entera
+app.add_middleware(RequestMetricsMiddleware)
+
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Buscar usuario en todas las tablas
-    user = None
-    role = None
-    
-    admin = db.query(models.Admin).filter(models.Admin.email == form_data.username).first()
-    if admin:
-        user = admin
-        role = "admin"
-    else:
-        trainer = db.query(models.Trainer).filter(models.Trainer.email == form_data.username).first()
-        if trainer:
-            user = trainer
-            role = "trainer"
-        else:
-            user = db.query(models.User).filter(models.User.email == form_data.username).first()
-            if user:
-                role = "user"
-
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Límite por IP y por email antes de la consulta y de bcrypt
+    await enforce_rate_limit("login", request, form_data.username)
+
+    # Buscar el usuario en el directorio de cuentas (una sola consulta)
+    role, user = await resolve_account(db, form_data.username)
+
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    await clear_rate_limit("login", request, form_data.username)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email, "role": role}, 
+        data=await token_claims(db, role, user),
         expires_delta=access_token_expires
     )
     # Incluir el rol en la respuesta
@@ -76,54 +126,49 @@ async def login_for_access_token(
 async def root():
     return {"message": "Fitness API is running"}
 
-# Middleware para verificar roles
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+@app.get("/healthz")
+async def healthz():
+    # Liveness: el proceso responde; no toca la base
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: arranque terminado y base de datos accesible
+    if not startup_report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting"})
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        role: str = payload.get("role")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email, role=role)
-    except JWTError:
-        raise credentials_exception
-    
-    if token_data.role == "admin":
-        user = db.query(models.Admin).filter(models.Admin.email == email).first()
-    elif token_data.role == "trainer":
-        user = db.query(models.Trainer).filter(models.Trainer.email == email).first()
-    else:
-        user = db.query(models.User).filter(models.User.email == email).first()
-    
-    if user is None:
-        raise credentials_exception
-    return {"user": user, "role": token_data.role}
-
-async def get_current_admin(current_user = Depends(get_current_user)):
-    if current_user["role"] != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins can access this resource"
-        )
-    return current_user
+        latency = await check_database()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": type(e).__name__})
+    return {
+        "status": "ready",
+        "db_latency_ms": round(latency * 1000, 2),
+        "import_seconds": startup_report["import_seconds"],
+        "startup_seconds": startup_report["startup_seconds"],
+        "steps": startup_report["steps"],
+    }
 
-async def get_current_trainer(current_user = Depends(get_current_user)):
-    if current_user["role"] not in ["admin", "trainer"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only trainers can access this resource"
-        )
-    return current_user
+def cache_stats():
+    return {
+        "principal": principal_cache.stats(),
+        "claims": claims_cache.stats(),
+        "token_version": token_version_cache.stats(),
+        "user_plans": user_plans_cache.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN:
+        expected = f"Bearer {METRICS_TOKEN}"
+        if not secrets.compare_digest(request.headers.get("authorization", ""), expected):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(
+        render_prometheus(pool_status(), hashing_stats(), cache_stats()), media_type="text/plain; version=0.0.4"
+    )
 
 # Incluir routers
 app.include_router(admin.router)
 app.include_router(trainer.router)
-app.include_router(user.router)
\ No newline at end of file
+app.include_router(user.router)
+
+startup_report["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 4)
@@ -1,5 +1,5 @@
 # models/models.py
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Text, Table
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -8,16 +8,78 @@ user_workout_plans = Table(
     'user_workout_plans',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('workout_plan_id', Integer, ForeignKey('workout_plans.id'), primary_key=True)
+    Column('workout_plan_id', Integer, ForeignKey('workout_plans.id'), primary_key=True),
+    # La PK cubre "planes de un usuario"; este índice cubre "usuarios de un plan"
+    Index('ix_user_workout_plans_plan_user', 'workout_plan_id', 'user_id')
 )
 
 user_nutrition_plans = Table(
     'user_nutrition_plans',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('nutrition_plan_id', Integer, ForeignKey('nutrition_plans.id'), primary_key=True)
+    Column('nutrition_plan_id', Integer, ForeignKey('nutrition_plans.id'), primary_key=True),
+    Index('ix_user_nutrition_plans_plan_user', 'nutrition_plan_id', 'user_id')
 )
 
+class Account(Base):
+    # Directorio unificado de identidades: email -> (rol, id en su tabla)
+    __tablename__ = "accounts"
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String(255), unique=True, index=True, nullable=False)
+    role = Column(String(20), nullable=False)
+    principal_id = Column(Integer, nullable=False)
+
+    __table_args__ = (UniqueConstraint("role", "principal_id", name="uq_accounts_role_principal"),)
+
+class PasswordResetToken(Base):
+    # Solo se guarda el hash del token; expires_at indexado para el barrido periódico
+    __tablename__ = "password_reset_tokens"
+    token_hash = Column(String(64), primary_key=True)
+    email = Column(String(255), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class EmailOutbox(Base):
+    # Correos pendientes; un emisor en segundo plano los envía y borra los ya entregados
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text)
+
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),)
+
+class DataVersion(Base):
+    # Contador por entrenador o usuario; lo incrementa cada escritura y sirve de ETag
+    __tablename__ = "data_versions"
+    scope = Column(String(20), primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+class TrainerStats(Base):
+    # Resumen del panel del entrenador; las rutas lo ajustan con deltas y un job lo reconcilia
+    __tablename__ = "trainer_stats"
+    trainer_id = Column(Integer, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)
+    workout_plans = Column(Integer, nullable=False, default=0)
+    nutrition_plans = Column(Integer, nullable=False, default=0)
+    routines = Column(Integer, nullable=False, default=0)
+    exercises = Column(Integer, nullable=False, default=0)
+    meals = Column(Integer, nullable=False, default=0)
+    workout_assignments = Column(Integer, nullable=False, default=0)
+    nutrition_assignments = Column(Integer, nullable=False, default=0)
+    reconciled_at = Column(DateTime)
+
+class TokenVersion(Base):
+    # Versión de los tokens de cada principal; subirla revoca los emitidos antes
+    __tablename__ = "token_versions"
+    role = Column(String(20), primary_key=True)
+    principal_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
 class Admin(Base):
     __tablename__ = "admins"
     id = Column(Integer, primary_key=True, index=True)
@@ -51,6 +113,9 @@ class User(Base):
     workout_plans = relationship("WorkoutPlan", secondary=user_workout_plans, back_populates="users")
     nutrition_plans = relationship("NutritionPlan", secondary=user_nutrition_plans, back_populates="users")
 
+    # Listados por entrenador paginados por id: filtro y orden salen del mismo índice
+    __table_args__ = (Index("ix_users_trainer_id_id", "trainer_id", "id"),)
+
 class WorkoutPlan(Base):
     __tablename__ = "workout_plans"
     id = Column(Integer, primary_key=True, index=True)
@@ -61,6 +126,8 @@ class WorkoutPlan(Base):
     exercises = relationship("Exercise", back_populates="workout_plan", cascade="all, delete-orphan")
     users = relationship("User", secondary=user_workout_plans, back_populates="workout_plans")
 
+    __table_args__ = (Index("ix_workout_plans_trainer_id_id", "trainer_id", "id"),)
+
 class Exercise(Base):
     __tablename__ = "exercises"
     id = Column(Integer, primary_key=True, index=True)
@@ -72,6 +139,12 @@ class Exercise(Base):
     workout_plan = relationship("WorkoutPlan", back_populates="exercises")
     routine = relationship("Routine", back_populates="exercises")
 
+    # Hijos de un plan o rutina en orden de id (selectinload, diff, clonado y exportación)
+    __table_args__ = (
+        Index("ix_exercises_workout_plan_id_id", "workout_plan_id", "id"),
+        Index("ix_exercises_routine_id_id", "routine_id", "id"),
+    )
+
 class Routine(Base):
     __tablename__ = "routines"
     id = Column(Integer, primary_key=True, index=True)
@@ -81,6 +154,8 @@ class Routine(Base):
     trainer = relationship("Trainer", back_populates="routines")
     exercises = relationship("Exercise", back_populates="routine")
 
+    __table_args__ = (Index("ix_routines_trainer_id_id", "trainer_id", "id"),)
+
 class NutritionPlan(Base):
     __tablename__ = "nutrition_plans"
     id = Column(Integer, primary_key=True, index=True)
@@ -91,6 +166,8 @@ class NutritionPlan(Base):
     meals = relationship("Meal", back_populates="nutrition_plan", cascade="all, delete-orphan")
     users = relationship("User", secondary=user_nutrition_plans, back_populates="nutrition_plans")
 
+    __table_args__ = (Index("ix_nutrition_plans_trainer_id_id", "trainer_id", "id"),)
+
 class Meal(Base):
     __tablename__ = "meals"
     id = Column(Integer, primary_key=True, index=True)
@@ -100,6 +177,8 @@ class Meal(Base):
     nutrition_plan_id = Column(Integer, ForeignKey("nutrition_plans.id"))
     nutrition_plan = relationship("NutritionPlan", back_populates="meals")
 
+    __table_args__ = (Index("ix_meals_nutrition_plan_id_id", "nutrition_plan_id", "id"),)
+
     
 class Plan(Base):
     __tablename__ = "plans"  # o la tabla que corresponda
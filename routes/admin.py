@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-import secrets
-from config.database import get_db
+from datetime import datetime
+from config.database import get_async_db, pool_status
 import models.models as models
 import schemas.schemas as schemas
-from utils.auth import get_current_admin, get_password_hash
-from utils.email import send_reset_email
+from utils.auth import get_current_admin, get_password_hash_async, invalidate_principal
+from utils.outbox import notify_outbox, queue_reset_email
+from utils.accounts import add_account, ensure_email_available, get_account, remove_account, update_account, ROLE_MODELS
+from utils.user_plans import invalidate_user_plans
+from utils.pagination import paginate
+from utils.fast_json import list_response
+from utils.reset_tokens import issue_reset_token, redeem_reset_token
+from utils.plan_children import EXERCISE_FIELDS, sync_children
+from utils.token_versions import revoke_tokens
+from utils.trainer_stats import adjust_trainer_stats, create_trainer_stats, remove_trainer_stats, remove_user_stats
+from utils.versions import bump_versions
+from utils.export import MEDIA_TYPES, get_export, stream_export
+from utils.rate_limit import enforce_rate_limit
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -21,76 +34,79 @@ class TrainerUpdate(BaseModel):
         from_attributes = True
 
 @router.post("/trainers/", response_model=schemas.Trainer)
-def create_trainer(
+async def create_trainer(
     trainer: schemas.TrainerCreate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    await ensure_email_available(db, trainer.email)
     db_trainer = models.Trainer(
         email=trainer.email,
-        hashed_password=get_password_hash(trainer.password),
+        hashed_password=await get_password_hash_async(trainer.password),
         full_name=trainer.full_name,
         admin_id=current_user["user"].id
     )
     db.add(db_trainer)
-    db.commit()
-    db.refresh(db_trainer)
+    await db.flush()
+    add_account(db, "trainer", db_trainer)
+    create_trainer_stats(db, db_trainer.id)
+    await bump_versions(db, trainer_ids=[db_trainer.id])
+    await db.commit()
+    await db.refresh(db_trainer)
     return db_trainer
 
 @router.get("/trainers/", response_model=List[schemas.Trainer])
-def read_trainers(
+async def read_trainers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    trainers = db.query(models.Trainer).offset(skip).limit(limit).all()
-    return trainers
+    trainers = await paginate(db, select(models.Trainer), models.Trainer.id, response, skip, limit, cursor)
+    return list_response(schemas.Trainer, trainers, response)
 
 @router.get("/users/", response_model=List[schemas.User])
-def read_users(
+async def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    users = db.query(models.User).offset(skip).limit(limit).all()
-    return users
+    users = await paginate(db, select(models.User), models.User.id, response, skip, limit, cursor)
+    return list_response(schemas.User, users, response)
 
 @router.put("/users/{user_id}", response_model=schemas.User)
 async def update_user(
     user_id: int,
     user_data: schemas.UserUpdate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Verificar si el usuario existe
-        db_user = db.query(models.User).filter(models.User.id == user_id).first()
+        db_user = await db.scalar(select(models.User).where(models.User.id == user_id))
         if not db_user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
-        # Verificar si el email ya existe en otro usuario
-        existing_user = db.query(models.User).filter(
-            models.User.email == user_data.email,
-            models.User.id != user_id
-        ).first()
-        if existing_user:
-            raise HTTPException(
-                status_code=400,
-                detail="El email ya está en uso"
-            )
+        # Verificar si el email ya existe en otra cuenta (de cualquier rol)
+        await ensure_email_available(db, user_data.email, "user", user_id, detail="El email ya está en uso")
         
         # Actualizar campos básicos
+        old_email = db_user.email
+        old_trainer_id = db_user.trainer_id
         db_user.email = user_data.email
         db_user.full_name = user_data.full_name
         
         # Actualizar trainer_id si se proporciona
         if user_data.trainer_id is not None:
             # Verificar que el trainer existe
-            trainer_exists = db.query(models.Trainer).filter(
+            trainer_exists = await db.scalar(select(models.Trainer).where(
                 models.Trainer.id == user_data.trainer_id
-            ).first()
+            ))
             if not trainer_exists and user_data.trainer_id != 0:
                 raise HTTPException(
                     status_code=404,
@@ -100,195 +116,270 @@ async def update_user(
         
         # Actualizar contraseña si se proporciona
         if user_data.password:
-            db_user.hashed_password = get_password_hash(user_data.password)
+            db_user.hashed_password = await get_password_hash_async(user_data.password)
+            await revoke_tokens(db, "user", user_id)
         
-        db.commit()
-        db.refresh(db_user)
+        if db_user.trainer_id != old_trainer_id:
+            await adjust_trainer_stats(db, old_trainer_id, users=-1)
+            await adjust_trainer_stats(db, db_user.trainer_id, users=1)
+        await update_account(db, "user", db_user)
+        await bump_versions(db, trainer_ids=[old_trainer_id, db_user.trainer_id], user_ids=[user_id])
+        await db.commit()
+        invalidate_principal("user", old_email, user_data.email, principal_id=user_id)
+        await db.refresh(db_user)
         return db_user
         
     except HTTPException as e:
         raise e
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.scalar(select(models.User).where(models.User.id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(db_user)
-    db.commit()
+    email = db_user.email
+    await remove_account(db, "user", db_user.id)
+    await remove_user_stats(db, user_id, db_user.trainer_id)
+    await db.delete(db_user)
+    await bump_versions(db, trainer_ids=[db_user.trainer_id], user_ids=[user_id])
+    await revoke_tokens(db, "user", user_id)
+    await db.commit()
+    invalidate_principal("user", email, principal_id=user_id)
+    invalidate_user_plans(user_id)
     return {"message": "User deleted"}
 
 @router.get("/plans/", response_model=List[schemas.Plan])
-def read_plans(
+async def read_plans(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_admin)
 ):
-    plans = db.query(models.WorkoutPlan).offset(skip).limit(limit).all()
-    return plans
+    plans = await paginate(db, select(models.WorkoutPlan), models.WorkoutPlan.id, response, skip, limit, cursor)
+    return list_response(schemas.Plan, plans, response)
 
 @router.get("/routines/", response_model=List[schemas.Routine])
-def read_routines(
+async def read_routines(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    routines = db.query(models.Routine).offset(skip).limit(limit).all()
-    return routines
+    routines = await paginate(db, select(models.Routine), models.Routine.id, response, skip, limit, cursor)
+    return list_response(schemas.Routine, routines, response)
 
 @router.post("/routines/", response_model=schemas.Routine)
-def create_routine(
+async def create_routine(
     routine: schemas.RoutineCreate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        db_routine = models.Routine(**routine.dict())
+        db_routine = models.Routine(**routine.dict(exclude={"exercises"}))
         db.add(db_routine)
-        db.commit()
-        db.refresh(db_routine)
+        await db.flush()
+        await sync_children(db, models.Exercise, "routine_id", db_routine.id,
+                            routine.exercises, EXERCISE_FIELDS, "Exercise")
+        await adjust_trainer_stats(db, db_routine.trainer_id, routines=1)
+        await bump_versions(db, trainer_ids=[db_routine.trainer_id])
+        await db.commit()
+        await db.refresh(db_routine)
         return db_routine
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
 @router.put("/routines/{routine_id}", response_model=schemas.Routine)
-def update_routine(
+async def update_routine(
     routine_id: int,
     routine_data: schemas.RoutineUpdate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_routine = db.query(models.Routine).filter(models.Routine.id == routine_id).first()
+    db_routine = await db.scalar(select(models.Routine).where(models.Routine.id == routine_id))
     if not db_routine:
         raise HTTPException(status_code=404, detail="Routine not found")
     
-    for field, value in routine_data.dict(exclude_unset=True).items():
+    for field, value in routine_data.dict(exclude_unset=True, exclude={"exercises"}).items():
         setattr(db_routine, field, value)
+
+    if routine_data.exercises is not None:
+        await sync_children(db, models.Exercise, "routine_id", routine_id,
+                            routine_data.exercises, EXERCISE_FIELDS, "Exercise")
     
     try:
-        db.commit()
-        db.refresh(db_routine)
+        await bump_versions(db, trainer_ids=[db_routine.trainer_id])
+        await db.commit()
+        await db.refresh(db_routine)
         return db_routine
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
 @router.delete("/routines/{routine_id}")
-def delete_routine(
+async def delete_routine(
     routine_id: int,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_routine = db.query(models.Routine).filter(models.Routine.id == routine_id).first()
+    db_routine = await db.scalar(select(models.Routine).where(models.Routine.id == routine_id))
     if not db_routine:
         raise HTTPException(status_code=404, detail="Routine not found")
     
-    db.delete(db_routine)
-    db.commit()
+    await db.delete(db_routine)
+    await adjust_trainer_stats(db, db_routine.trainer_id, routines=-1)
+    await bump_versions(db, trainer_ids=[db_routine.trainer_id])
+    await db.commit()
     return {"message": "Routine deleted"}
 
 
 @router.get("/workout-plans/", response_model=List[schemas.WorkoutPlan])
-def read_workout_plans(
+async def read_workout_plans(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    workout_plans = db.query(models.WorkoutPlan).offset(skip).limit(limit).all()
-    return workout_plans
+    workout_plans = await paginate(
+        db,
+        select(models.WorkoutPlan).options(selectinload(models.WorkoutPlan.exercises)),
+        models.WorkoutPlan.id, response, skip, limit, cursor
+    )
+    return list_response(schemas.WorkoutPlan, workout_plans, response)
 
 @router.get("/nutrition-plans/", response_model=List[schemas.NutritionPlan])
-def read_nutrition_plans(
+async def read_nutrition_plans(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    nutrition_plans = db.query(models.NutritionPlan).offset(skip).limit(limit).all()
-    return nutrition_plans
+    nutrition_plans = await paginate(
+        db,
+        select(models.NutritionPlan).options(selectinload(models.NutritionPlan.meals)),
+        models.NutritionPlan.id, response, skip, limit, cursor
+    )
+    return list_response(schemas.NutritionPlan, nutrition_plans, response)
 
 @router.put("/trainers/{trainer_id}", response_model=schemas.Trainer)
 async def update_trainer(
     trainer_id: int,
     trainer_data: TrainerUpdate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verificar si el entrenador existe
-    db_trainer = db.query(models.Trainer).filter(models.Trainer.id == trainer_id).first()
+    db_trainer = await db.scalar(select(models.Trainer).where(models.Trainer.id == trainer_id))
     if not db_trainer:
         raise HTTPException(status_code=404, detail="Trainer not found")
+    await ensure_email_available(db, trainer_data.email, "trainer", trainer_id)
     
     # Actualizar campos
+    old_email = db_trainer.email
     db_trainer.email = trainer_data.email
     db_trainer.full_name = trainer_data.full_name
     
     # Solo actualizar la contraseña si se proporciona una nueva
-    if trainer_data.password:
-        db_trainer.hashed_password = get_password_hash(trainer_data.password)
-    
     try:
-        db.commit()
-        db.refresh(db_trainer)
+        if trainer_data.password:
+            db_trainer.hashed_password = await get_password_hash_async(trainer_data.password)
+            await revoke_tokens(db, "trainer", trainer_id)
+
+        await update_account(db, "trainer", db_trainer)
+        await bump_versions(db, trainer_ids=[trainer_id])
+        await db.commit()
+        invalidate_principal("trainer", old_email, trainer_data.email, principal_id=trainer_id)
+        await db.refresh(db_trainer)
         return db_trainer
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
 @router.delete("/trainers/{trainer_id}")
-def delete_trainer(
+async def delete_trainer(
     trainer_id: int,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_trainer = db.query(models.Trainer).filter(models.Trainer.id == trainer_id).first()
+    db_trainer = await db.scalar(select(models.Trainer).where(models.Trainer.id == trainer_id))
     if not db_trainer:
         raise HTTPException(status_code=404, detail="Trainer not found")
     
-    db.delete(db_trainer)
-    db.commit()
+    email = db_trainer.email
+    await remove_account(db, "trainer", db_trainer.id)
+    await remove_trainer_stats(db, trainer_id)
+    await db.delete(db_trainer)
+    await bump_versions(db, trainer_ids=[trainer_id])
+    await revoke_tokens(db, "trainer", trainer_id)
+    await db.commit()
+    invalidate_principal("trainer", email, principal_id=trainer_id)
     return {"message": "Trainer deleted"}
 
-reset_tokens = {}
+@router.get("/export/{resource}")
+async def export_resource(
+    resource: str,
+    format: str = "ndjson",
+    current_user = Depends(get_current_admin)
+):
+    # Volcado completo en streaming (users, trainers, routines, workout-plans, nutrition-plans);
+    # usa su propia sesión con cursor del lado del servidor
+    get_export(resource, format)
+    return StreamingResponse(
+        stream_export(resource, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{format}"'},
+    )
+
+@router.get("/db-pool")
+async def read_db_pool(current_user = Depends(get_current_admin)):
+    # Métricas del pool de conexiones (conexiones en uso, overflow, esperas, rotación)
+    return pool_status()
 
 @router.post("/create-admin/", response_model=schemas.Admin)
 async def create_admin(
     admin: schemas.AdminCreate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    await ensure_email_available(db, admin.email)
     db_admin = models.Admin(
         email=admin.email,
-        hashed_password=get_password_hash(admin.password),
+        hashed_password=await get_password_hash_async(admin.password),
         full_name=admin.full_name
     )
     db.add(db_admin)
-    db.commit()
-    db.refresh(db_admin)
+    await db.flush()
+    add_account(db, "admin", db_admin)
+    await db.commit()
+    await db.refresh(db_admin)
     return db_admin
 
 @router.put("/admin/{admin_id}", response_model=schemas.Admin)
@@ -296,24 +387,29 @@ async def update_admin(
     admin_id: int,
     admin_data: schemas.AdminUpdate,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_admin = db.query(models.Admin).filter(models.Admin.id == admin_id).first()
+    db_admin = await db.scalar(select(models.Admin).where(models.Admin.id == admin_id))
     if not db_admin:
         raise HTTPException(status_code=404, detail="Admin not found")
+    await ensure_email_available(db, admin_data.email, "admin", admin_id)
     
+    old_email = db_admin.email
     db_admin.email = admin_data.email
     db_admin.full_name = admin_data.full_name
     
-    if admin_data.password:
-        db_admin.hashed_password = get_password_hash(admin_data.password)
-    
     try:
-        db.commit()
-        db.refresh(db_admin)
+        if admin_data.password:
+            db_admin.hashed_password = await get_password_hash_async(admin_data.password)
+            await revoke_tokens(db, "admin", admin_id)
+
+        await update_account(db, "admin", db_admin)
+        await db.commit()
+        invalidate_principal("admin", old_email, admin_data.email, principal_id=admin_id)
+        await db.refresh(db_admin)
         return db_admin
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -323,70 +419,78 @@ async def update_admin(
 async def delete_admin(
     admin_id: int,
     current_user = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_admin = db.query(models.Admin).filter(models.Admin.id == admin_id).first()
+    db_admin = await db.scalar(select(models.Admin).where(models.Admin.id == admin_id))
     if not db_admin:
         raise HTTPException(status_code=404, detail="Admin not found")
     
-    db.delete(db_admin)
-    db.commit()
+    email = db_admin.email
+    await remove_account(db, "admin", db_admin.id)
+    await db.delete(db_admin)
+    await revoke_tokens(db, "admin", admin_id)
+    await db.commit()
+    invalidate_principal("admin", email, principal_id=admin_id)
     return {"message": "Admin deleted"}
 
 
 @router.post("/request-password-reset/")
 async def request_password_reset(
     request: schemas.AdminLoginReset,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = None
-    # Buscar en todas las tablas
-    admin = db.query(models.Admin).filter(models.Admin.email == request.email).first()
-    trainer = db.query(models.Trainer).filter(models.Trainer.email == request.email).first()
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+    await enforce_rate_limit("reset", http_request, request.email)
+
+    # Buscar en el directorio de cuentas
+    account = await get_account(db, request.email)
 
-    if not any([admin, trainer, user]):
+    if not account:
         raise HTTPException(status_code=404, detail="Email no encontrado")
 
-    # Generar token
-    token = secrets.token_urlsafe(32)
-    reset_tokens[token] = {
-        "email": request.email,
-        "expires": datetime.utcnow() + timedelta(hours=1)
-    }
+    # Generar token (se guarda solo su hash)
+    token = await issue_reset_token(db, request.email)
 
-    # Enviar email
-    send_reset_email(request.email, token)
+    # Encolar el email en la misma transacción; el emisor en segundo plano lo envía
+    queue_reset_email(db, request.email, token)
+    await db.commit()
+    notify_outbox()
     
     return {"message": "Si el email existe, recibirás instrucciones para resetear tu contraseña"}
 
 @router.post("/reset-password/")
 async def reset_password(
     reset_data: schemas.PasswordReset,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    token_data = reset_tokens.get(reset_data.token)
+    # Solo por IP: frena la prueba masiva de tokens
+    await enforce_rate_limit("redeem", request)
+    token_data = await redeem_reset_token(db, reset_data.token)
     if not token_data:
         raise HTTPException(status_code=400, detail="Token inválido")
-    
-    if datetime.utcnow() > token_data["expires"]:
+
+    email, expires_at = token_data
+    if datetime.utcnow() > expires_at:
+        # Un token expirado no sirve de nada: se confirma su borrado
+        await db.commit()
         raise HTTPException(status_code=400, detail="Token expirado")
 
     # Actualizar contraseña en la tabla correspondiente
-    admin = db.query(models.Admin).filter(models.Admin.email == token_data["email"]).first()
-    trainer = db.query(models.Trainer).filter(models.Trainer.email == token_data["email"]).first()
-    user = db.query(models.User).filter(models.User.email == token_data["email"]).first()
-
-    new_password_hash = get_password_hash(reset_data.new_password)
+    account = await get_account(db, email)
+    if not account:
+        raise HTTPException(status_code=400, detail="Token inválido")
 
-    if admin:
-        admin.hashed_password = new_password_hash
-    elif trainer:
-        trainer.hashed_password = new_password_hash
-    elif user:
-        user.hashed_password = new_password_hash
+    new_password_hash = await get_password_hash_async(reset_data.new_password)
 
-    db.commit()
-    del reset_tokens[reset_data.token]
+    model = ROLE_MODELS[account.role]
+    await db.execute(
+        update(model).where(model.id == account.principal_id).values(
+            hashed_password=new_password_hash
+        )
+    )
+    await revoke_tokens(db, account.role, account.principal_id)
+    await db.commit()
+    invalidate_principal(account.role, account.email, principal_id=account.principal_id)
     
     return {"message": "Contraseña actualizada exitosamente"}
\ No newline at end of file
@@ -1,112 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
-from config.database import get_db
+from config.database import get_async_db
 import models.models as models
 import schemas.schemas as schemas
-from utils.auth import get_current_trainer, get_password_hash
+from utils.auth import get_current_trainer, get_password_hash_async, invalidate_principal
+from utils.accounts import add_account, ensure_email_available, remove_account, update_account
+from utils.user_plans import invalidate_user_plans, nutrition_plan_user_ids, workout_plan_user_ids
+from utils.pagination import paginate
+from utils.fast_json import list_response
+from utils.user_import import import_users as bulk_import_users
+from utils.assignments import assign_plans, owned_ids, unique_ids, verify_owned
+from utils.plan_children import EXERCISE_FIELDS, MEAL_FIELDS, clone_plan, sync_children
+from utils.token_versions import revoke_tokens
+from utils.trainer_stats import adjust_trainer_stats, count_rows, get_trainer_stats, remove_user_stats, stats_response
+from utils.versions import bump_versions, conditional_get
 
 router = APIRouter(prefix="/trainer", tags=["trainer"])
 
 @router.post("/users/", response_model=schemas.User)
-def create_user(
+async def create_user(
     user: schemas.UserCreate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    await ensure_email_available(db, user.email)
     db_user = models.User(
         email=user.email,
-        hashed_password=get_password_hash(user.password),
+        hashed_password=await get_password_hash_async(user.password),
         full_name=user.full_name,
         trainer_id=current_user["user"].id
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    add_account(db, "user", db_user)
+    await adjust_trainer_stats(db, current_user["user"].id, users=1)
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
+@router.post("/users/import")
+async def import_users(
+    request: Request,
+    format: Optional[str] = None,
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Importación masiva en streaming: CSV con cabecera (email,full_name,password) o NDJSON
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("csv" if "csv" in content_type else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unsupported import format")
+
+    return await bulk_import_users(db, request.stream(), fmt, current_user["user"].id)
+
 @router.get("/users/", response_model=List[schemas.User])
-def read_users(
+async def read_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    users = db.query(models.User).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    users = await paginate(db, select(models.User).where(
         models.User.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return users
+    ), models.User.id, response, skip, limit, cursor)
+    return list_response(schemas.User, users, response)
 
 @router.put("/users/{user_id}", response_model=schemas.User)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: schemas.UserCreate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(models.User).filter(
+    db_user = await db.scalar(select(models.User).where(
         models.User.id == user_id,
         models.User.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    await ensure_email_available(db, user_update.email, "user", user_id)
     
+    old_email = db_user.email
     db_user.email = user_update.email
     db_user.full_name = user_update.full_name
     if user_update.password:
-        db_user.hashed_password = get_password_hash(user_update.password)
+        db_user.hashed_password = await get_password_hash_async(user_update.password)
+        await revoke_tokens(db, "user", user_id)
     
-    db.commit()
-    db.refresh(db_user)
+    await update_account(db, "user", db_user)
+    await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=[user_id])
+    await db.commit()
+    invalidate_principal("user", old_email, user_update.email, principal_id=user_id)
+    await db.refresh(db_user)
     return db_user
 
 @router.delete("/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(models.User).filter(
+    db_user = await db.scalar(select(models.User).where(
         models.User.id == user_id,
         models.User.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(db_user)
-    db.commit()
+    email = db_user.email
+    await remove_account(db, "user", db_user.id)
+    await remove_user_stats(db, user_id, current_user["user"].id)
+    await db.delete(db_user)
+    await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=[user_id])
+    await revoke_tokens(db, "user", user_id)
+    await db.commit()
+    invalidate_principal("user", email, principal_id=user_id)
+    invalidate_user_plans(user_id)
     return {"message": "User deleted"}
 
+@router.get("/stats", response_model=schemas.TrainerStats)
+async def read_stats(
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Una lectura por clave primaria del resumen, sin recorrer las tablas del entrenador
+    return stats_response(await get_trainer_stats(db, current_user["user"].id))
+
 @router.get("/plans/", response_model=List[schemas.Plan])
-def read_plans(
+async def read_plans(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_trainer)
 ):
-    plans = db.query(models.WorkoutPlan).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    plans = await paginate(db, select(models.WorkoutPlan).where(
         models.WorkoutPlan.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return plans
+    ), models.WorkoutPlan.id, response, skip, limit, cursor)
+    return list_response(schemas.Plan, plans, response)
 
 @router.get("/routines/", response_model=List[schemas.Routine])
-def read_routines(
+async def read_routines(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    routines = db.query(models.Routine).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    routines = await paginate(db, select(models.Routine).where(
         models.Routine.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return routines
+    ), models.Routine.id, response, skip, limit, cursor)
+    return list_response(schemas.Routine, routines, response)
 
 @router.post("/routines/", response_model=schemas.Routine)
-def create_routine(
+async def create_routine(
     routine: schemas.RoutineCreate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_routine = models.Routine(
         name=routine.name,
@@ -114,7 +188,7 @@ def create_routine(
         trainer_id=current_user["user"].id
     )
     db.add(db_routine)
-    db.flush()
+    await db.flush()
 
     for exercise in routine.exercises:
         db_exercise = models.Exercise(
@@ -123,21 +197,23 @@ def create_routine(
         )
         db.add(db_exercise)
 
-    db.commit()
-    db.refresh(db_routine)
+    await adjust_trainer_stats(db, current_user["user"].id, routines=1)
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    await db.refresh(db_routine)
     return db_routine
 
 @router.put("/routines/{routine_id}", response_model=schemas.Routine)
-def update_routine(
+async def update_routine(
     routine_id: int,
     routine: schemas.RoutineUpdate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_routine = db.query(models.Routine).filter(
+    db_routine = await db.scalar(select(models.Routine).where(
         models.Routine.id == routine_id,
         models.Routine.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_routine:
         raise HTTPException(status_code=404, detail="Routine not found")
 
@@ -148,73 +224,86 @@ def update_routine(
 
     # If exercises are provided, update them
     if routine.exercises is not None:
-        # Delete existing exercises
-        db.query(models.Exercise).filter(models.Exercise.routine_id == routine_id).delete()
-        
-        # Add new exercises
-        for exercise in routine.exercises:
-            db_exercise = models.Exercise(
-                **exercise.dict(),
-                routine_id=routine_id
-            )
-            db.add(db_exercise)
-
-    db.commit()
-    db.refresh(db_routine)
+        await sync_children(db, models.Exercise, "routine_id", routine_id,
+                            routine.exercises, EXERCISE_FIELDS, "Exercise")
+
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    await db.refresh(db_routine)
     return db_routine
 
 @router.delete("/routines/{routine_id}")
-def delete_routine(
+async def delete_routine(
     routine_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_routine = db.query(models.Routine).filter(
+    db_routine = await db.scalar(select(models.Routine).where(
         models.Routine.id == routine_id,
         models.Routine.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_routine:
         raise HTTPException(status_code=404, detail="Routine not found")
 
     # Delete associated exercises first
-    db.query(models.Exercise).filter(models.Exercise.routine_id == routine_id).delete()
+    await db.execute(delete(models.Exercise).where(models.Exercise.routine_id == routine_id))
     
     # Delete the routine
-    db.delete(db_routine)
-    db.commit()
+    await db.delete(db_routine)
+    await adjust_trainer_stats(db, current_user["user"].id, routines=-1)
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
     
     return {"message": "Routine deleted successfully"}
 
 
 @router.get("/workout-plans/", response_model=List[schemas.WorkoutPlan])
-def read_workout_plans(
+async def read_workout_plans(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    workout_plans = db.query(models.WorkoutPlan).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    workout_plans = await paginate(db, select(models.WorkoutPlan).options(
+        selectinload(models.WorkoutPlan.exercises)
+    ).where(
         models.WorkoutPlan.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return workout_plans
+    ), models.WorkoutPlan.id, response, skip, limit, cursor)
+    return list_response(schemas.WorkoutPlan, workout_plans, response)
 
 @router.get("/nutrition-plans/", response_model=List[schemas.NutritionPlan])
-def read_nutrition_plans(
+async def read_nutrition_plans(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    nutrition_plans = db.query(models.NutritionPlan).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    nutrition_plans = await paginate(db, select(models.NutritionPlan).options(
+        selectinload(models.NutritionPlan.meals)
+    ).where(
         models.NutritionPlan.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return nutrition_plans
+    ), models.NutritionPlan.id, response, skip, limit, cursor)
+    return list_response(schemas.NutritionPlan, nutrition_plans, response)
 
 @router.post("/workout-plans/", response_model=schemas.WorkoutPlan)
-def create_workout_plan(
+async def create_workout_plan(
     plan: schemas.WorkoutPlanCreate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_plan = models.WorkoutPlan(
         name=plan.name,
@@ -222,7 +311,7 @@ def create_workout_plan(
         trainer_id=current_user["user"].id
     )
     db.add(db_plan)
-    db.flush()
+    await db.flush()
 
     for exercise in plan.exercises:
         db_exercise = models.Exercise(
@@ -231,8 +320,10 @@ def create_workout_plan(
         )
         db.add(db_exercise)
 
-    db.commit()
-    db.refresh(db_plan)
+    await adjust_trainer_stats(db, current_user["user"].id, workout_plans=1, exercises=len(plan.exercises))
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    await db.refresh(db_plan, ["exercises"])
     return db_plan
 
 
@@ -248,59 +339,87 @@ def create_workout_plan(
 
 
 @router.put("/workout-plans/{plan_id}", response_model=schemas.WorkoutPlan)
-def update_workout_plan(
+async def update_workout_plan(
     plan_id: int,
-    plan_update: schemas.WorkoutPlanCreate,
+    plan_update: schemas.WorkoutPlanUpdate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_plan = db.query(models.WorkoutPlan).filter(
+    db_plan = await db.scalar(select(models.WorkoutPlan).where(
         models.WorkoutPlan.id == plan_id,
         models.WorkoutPlan.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
+    user_ids = await workout_plan_user_ids(db, plan_id)
     db_plan.name = plan_update.name
     db_plan.description = plan_update.description
     
-    # Delete existing exercises
-    db.query(models.Exercise).filter(models.Exercise.workout_plan_id == plan_id).delete()
-    
-    # Add new exercises
-    for exercise in plan_update.exercises:
-        db_exercise = models.Exercise(
-            **exercise.dict(),
-            workout_plan_id=db_plan.id
-        )
-        db.add(db_exercise)
-    
-    db.commit()
-    db.refresh(db_plan)
+    changed, added = await sync_children(db, models.Exercise, "workout_plan_id", plan_id,
+                                         plan_update.exercises, EXERCISE_FIELDS, "Exercise")
+    await adjust_trainer_stats(db, current_user["user"].id, exercises=added)
+
+    # Un PUT sin cambios no invalida los ETag de los clientes
+    if changed or db.is_modified(db_plan):
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
+    await db.refresh(db_plan, ["exercises"])
     return db_plan
 
+@router.post("/workout-plans/{plan_id}/clone", response_model=List[schemas.WorkoutPlan])
+async def clone_workout_plan(
+    plan_id: int,
+    count: int = 1,
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_plan = await db.scalar(select(models.WorkoutPlan).where(
+        models.WorkoutPlan.id == plan_id,
+        models.WorkoutPlan.trainer_id == current_user["user"].id
+    ))
+    if not db_plan:
+        raise HTTPException(status_code=404, detail="Workout plan not found")
+
+    new_ids, copied = await clone_plan(db, models.WorkoutPlan, models.Exercise, "workout_plan_id",
+                                       db_plan, EXERCISE_FIELDS, count)
+    await adjust_trainer_stats(db, current_user["user"].id, workout_plans=len(new_ids), exercises=copied)
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    return (await db.scalars(select(models.WorkoutPlan).options(
+        selectinload(models.WorkoutPlan.exercises)
+    ).where(models.WorkoutPlan.id.in_(new_ids)).order_by(models.WorkoutPlan.id))).all()
+
 @router.delete("/workout-plans/{plan_id}")
-def delete_workout_plan(
+async def delete_workout_plan(
     plan_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_plan = db.query(models.WorkoutPlan).filter(
+    db_plan = await db.scalar(select(models.WorkoutPlan).where(
         models.WorkoutPlan.id == plan_id,
         models.WorkoutPlan.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
-    db.delete(db_plan)
-    db.commit()
+    user_ids = await workout_plan_user_ids(db, plan_id)
+    await adjust_trainer_stats(
+        db, current_user["user"].id, workout_plans=-1, workout_assignments=-len(user_ids),
+        exercises=-await count_rows(db, models.Exercise.workout_plan_id, plan_id),
+    )
+    await db.delete(db_plan)
+    await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
     return {"message": "Workout plan deleted"}
 
 @router.post("/nutrition-plans/", response_model=schemas.NutritionPlan)
-def create_nutrition_plan(
+async def create_nutrition_plan(
     plan: schemas.NutritionPlanCreate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     db_plan = models.NutritionPlan(
         name=plan.name,
@@ -308,7 +427,7 @@ def create_nutrition_plan(
         trainer_id=current_user["user"].id
     )
     db.add(db_plan)
-    db.flush()
+    await db.flush()
 
     for meal in plan.meals:
         db_meal = models.Meal(
@@ -317,117 +436,183 @@ def create_nutrition_plan(
         )
         db.add(db_meal)
 
-    db.commit()
-    db.refresh(db_plan)
+    await adjust_trainer_stats(db, current_user["user"].id, nutrition_plans=1, meals=len(plan.meals))
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    await db.refresh(db_plan, ["meals"])
     return db_plan
 
 @router.get("/nutrition-plans/", response_model=List[schemas.NutritionPlan])
-def read_nutrition_plans(
+async def read_nutrition_plans(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    plans = db.query(models.NutritionPlan).filter(
+    _, not_modified = await conditional_get(db, request, response, "trainer", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    plans = await paginate(db, select(models.NutritionPlan).options(
+        selectinload(models.NutritionPlan.meals)
+    ).where(
         models.NutritionPlan.trainer_id == current_user["user"].id
-    ).offset(skip).limit(limit).all()
-    return plans
+    ), models.NutritionPlan.id, response, skip, limit, cursor)
+    return list_response(schemas.NutritionPlan, plans, response)
 
 @router.put("/nutrition-plans/{plan_id}", response_model=schemas.NutritionPlan)
-def update_nutrition_plan(
+async def update_nutrition_plan(
     plan_id: int,
-    plan_update: schemas.NutritionPlanCreate,
+    plan_update: schemas.NutritionPlanUpdate,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_plan = db.query(models.NutritionPlan).filter(
+    db_plan = await db.scalar(select(models.NutritionPlan).where(
         models.NutritionPlan.id == plan_id,
         models.NutritionPlan.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_plan:
         raise HTTPException(status_code=404, detail="Nutrition plan not found")
     
+    user_ids = await nutrition_plan_user_ids(db, plan_id)
     db_plan.name = plan_update.name
     db_plan.description = plan_update.description
     
-    # Delete existing meals
-    db.query(models.Meal).filter(models.Meal.nutrition_plan_id == plan_id).delete()
-    
-    # Add new meals
-    for meal in plan_update.meals:
-        db_meal = models.Meal(
-            **meal.dict(),
-            nutrition_plan_id=db_plan.id
-        )
-        db.add(db_meal)
-    
-    db.commit()
-    db.refresh(db_plan)
+    changed, added = await sync_children(db, models.Meal, "nutrition_plan_id", plan_id,
+                                         plan_update.meals, MEAL_FIELDS, "Meal")
+    await adjust_trainer_stats(db, current_user["user"].id, meals=added)
+
+    if changed or db.is_modified(db_plan):
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
+    await db.refresh(db_plan, ["meals"])
     return db_plan
 
+@router.post("/nutrition-plans/{plan_id}/clone", response_model=List[schemas.NutritionPlan])
+async def clone_nutrition_plan(
+    plan_id: int,
+    count: int = 1,
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_plan = await db.scalar(select(models.NutritionPlan).where(
+        models.NutritionPlan.id == plan_id,
+        models.NutritionPlan.trainer_id == current_user["user"].id
+    ))
+    if not db_plan:
+        raise HTTPException(status_code=404, detail="Nutrition plan not found")
+
+    new_ids, copied = await clone_plan(db, models.NutritionPlan, models.Meal, "nutrition_plan_id",
+                                       db_plan, MEAL_FIELDS, count)
+    await adjust_trainer_stats(db, current_user["user"].id, nutrition_plans=len(new_ids), meals=copied)
+    await bump_versions(db, trainer_ids=[current_user["user"].id])
+    await db.commit()
+    return (await db.scalars(select(models.NutritionPlan).options(
+        selectinload(models.NutritionPlan.meals)
+    ).where(models.NutritionPlan.id.in_(new_ids)).order_by(models.NutritionPlan.id))).all()
+
 @router.delete("/nutrition-plans/{plan_id}")
-def delete_nutrition_plan(
+async def delete_nutrition_plan(
     plan_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_plan = db.query(models.NutritionPlan).filter(
+    db_plan = await db.scalar(select(models.NutritionPlan).where(
         models.NutritionPlan.id == plan_id,
         models.NutritionPlan.trainer_id == current_user["user"].id
-    ).first()
+    ))
     if not db_plan:
         raise HTTPException(status_code=404, detail="Nutrition plan not found")
     
-    db.delete(db_plan)
-    db.commit()
+    user_ids = await nutrition_plan_user_ids(db, plan_id)
+    await adjust_trainer_stats(
+        db, current_user["user"].id, nutrition_plans=-1, nutrition_assignments=-len(user_ids),
+        meals=-await count_rows(db, models.Meal.nutrition_plan_id, plan_id),
+    )
+    await db.delete(db_plan)
+    await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
     return {"message": "Nutrition plan deleted"}
 
+@router.post("/assign-workout/bulk")
+async def bulk_assign_workout_plans(
+    assignment: schemas.BulkPlanAssignment,
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user_ids, plan_ids = unique_ids(assignment.user_ids, assignment.plan_ids)
+    await verify_owned(db, models.User, user_ids, current_user["user"].id, "Users")
+    await verify_owned(db, models.WorkoutPlan, plan_ids, current_user["user"].id, "Workout plans")
+
+    assigned = await assign_plans(db, models.user_workout_plans, "workout_plan_id", user_ids, plan_ids)
+    if assigned:
+        await adjust_trainer_stats(db, current_user["user"].id, workout_assignments=assigned)
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
+    return {"message": "Workout plans assigned successfully", "users": len(user_ids), "plans": len(plan_ids)}
+
+@router.post("/assign-nutrition/bulk")
+async def bulk_assign_nutrition_plans(
+    assignment: schemas.BulkPlanAssignment,
+    current_user = Depends(get_current_trainer),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user_ids, plan_ids = unique_ids(assignment.user_ids, assignment.plan_ids)
+    await verify_owned(db, models.User, user_ids, current_user["user"].id, "Users")
+    await verify_owned(db, models.NutritionPlan, plan_ids, current_user["user"].id, "Nutrition plans")
+
+    assigned = await assign_plans(db, models.user_nutrition_plans, "nutrition_plan_id", user_ids, plan_ids)
+    if assigned:
+        await adjust_trainer_stats(db, current_user["user"].id, nutrition_assignments=assigned)
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=user_ids)
+    await db.commit()
+    invalidate_user_plans(*user_ids)
+    return {"message": "Nutrition plans assigned successfully", "users": len(user_ids), "plans": len(plan_ids)}
+
 @router.post("/assign-workout/{user_id}/{plan_id}")
-def assign_workout_plan(
+async def assign_workout_plan(
     user_id: int,
     plan_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(
-        models.User.id == user_id,
-        models.User.trainer_id == current_user["user"].id
-    ).first()
-    if not user:
+    if not await owned_ids(db, models.User, [user_id], current_user["user"].id):
         raise HTTPException(status_code=404, detail="User not found")
 
-    plan = db.query(models.WorkoutPlan).filter(
-        models.WorkoutPlan.id == plan_id,
-        models.WorkoutPlan.trainer_id == current_user["user"].id
-    ).first()
-    if not plan:
+    if not await owned_ids(db, models.WorkoutPlan, [plan_id], current_user["user"].id):
         raise HTTPException(status_code=404, detail="Workout plan not found")
 
-    user.workout_plans.append(plan)
-    db.commit()
+    assigned = await assign_plans(db, models.user_workout_plans, "workout_plan_id", [user_id], [plan_id])
+    if assigned:
+        await adjust_trainer_stats(db, current_user["user"].id, workout_assignments=assigned)
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=[user_id])
+    await db.commit()
+    invalidate_user_plans(user_id)
     return {"message": "Workout plan assigned successfully"}
 
 @router.post("/assign-nutrition/{user_id}/{plan_id}")
-def assign_nutrition_plan(
+async def assign_nutrition_plan(
     user_id: int,
     plan_id: int,
     current_user = Depends(get_current_trainer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(
-        models.User.id == user_id,
-        models.User.trainer_id == current_user["user"].id
-    ).first()
-    if not user:
+    if not await owned_ids(db, models.User, [user_id], current_user["user"].id):
         raise HTTPException(status_code=404, detail="User not found")
 
-    plan = db.query(models.NutritionPlan).filter(
-        models.NutritionPlan.id == plan_id,
-        models.NutritionPlan.trainer_id == current_user["user"].id
-    ).first()
-    if not plan:
+    if not await owned_ids(db, models.NutritionPlan, [plan_id], current_user["user"].id):
         raise HTTPException(status_code=404, detail="Nutrition plan not found")
 
-    user.nutrition_plans.append(plan)
-    db.commit()
+    assigned = await assign_plans(db, models.user_nutrition_plans, "nutrition_plan_id", [user_id], [plan_id])
+    if assigned:
+        await adjust_trainer_stats(db, current_user["user"].id, nutrition_assignments=assigned)
+        await bump_versions(db, trainer_ids=[current_user["user"].id], user_ids=[user_id])
+    await db.commit()
+    invalidate_user_plans(user_id)
     return {"message": "Nutrition plan assigned successfully"}
\ No newline at end of file
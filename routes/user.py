@@ -1,77 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.database import get_db
+from config.database import get_async_db
 import models.models as models
 import schemas.schemas as schemas
-from utils.auth import get_current_user
+from utils.auth import get_current_user, invalidate_principal
+from utils.accounts import ensure_email_available, update_account
+from utils.trainer_stats import adjust_trainer_stats
+from utils.user_plans import get_user_plans_document
+from utils.versions import bump_versions, conditional_get
 
 router = APIRouter(prefix="/user", tags=["user"])
 
 @router.get("/profile/", response_model=schemas.User)
-def read_user_profile(
+async def read_user_profile(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can access their profile")
     return current_user["user"]
 
 @router.put("/profile/", response_model=schemas.User)
-def update_user_profile(
+async def update_user_profile(
     user_update: schemas.UserUpdate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can update their profile")
     
-    user = db.query(models.User).filter(models.User.id == current_user["user"].id).first()
+    user = await db.scalar(select(models.User).where(models.User.id == current_user["user"].id))
+    await ensure_email_available(db, user_update.email, "user", user.id)
     
+    old_trainer_id = user.trainer_id
     for field, value in user_update.dict(exclude_unset=True).items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    if user.trainer_id != old_trainer_id:
+        await adjust_trainer_stats(db, old_trainer_id, users=-1)
+        await adjust_trainer_stats(db, user.trainer_id, users=1)
+    await update_account(db, "user", user)
+    await bump_versions(db, trainer_ids=[old_trainer_id, user.trainer_id], user_ids=[user.id])
+    new_email = user.email
+    await db.commit()
+    invalidate_principal("user", current_user["user"].email, new_email)
+    await db.refresh(user)
     return user
 
 @router.get("/plans/", response_model=dict)
 async def get_user_plans(
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can access their plans")
-    
-    user = db.query(models.User).filter(models.User.id == current_user["user"].id).first()
-    
-    return {
-        "workout_plans": [
-            {
-                "id": plan.id,
-                "name": plan.name,
-                "description": plan.description,
-                "exercises": [
-                    {
-                        "name": exercise.name,
-                        "sets": exercise.sets,
-                        "reps": exercise.reps
-                    } for exercise in plan.exercises
-                ]
-            } for plan in user.workout_plans
-        ],
-        "nutrition_plans": [
-            {
-                "id": plan.id,
-                "name": plan.name,
-                "description": plan.description,
-                "meals": [
-                    {
-                        "name": meal.name,
-                        "description": meal.description,
-                        "calories": meal.calories
-                    } for meal in plan.meals
-                ]
-            } for plan in user.nutrition_plans
-        ]
-    }
\ No newline at end of file
+
+    version, not_modified = await conditional_get(db, request, response, "user", current_user["user"].id)
+    if not_modified:
+        return not_modified
+
+    return await get_user_plans_document(db, current_user["user"].id, version)
@@ -76,19 +76,12 @@ class Routine(BaseModel):
     id: int
     name: str
     description: str | None = None
-    trainer_id: int
+    # Las rutinas creadas por un admin no tienen entrenador
+    trainer_id: int | None = None
 
     class Config:
         from_attributes = True
 
-class RoutineCreate(BaseModel):
-    name: str
-    description: str | None = None
-
-class RoutineUpdate(BaseModel):
-    name: str | None = None
-    description: str | None = None
-
 
 class ExerciseBase(BaseModel):
     name: str
@@ -98,6 +91,9 @@ class ExerciseBase(BaseModel):
 class ExerciseCreate(ExerciseBase):
     pass
 
+class ExerciseUpdate(ExerciseBase):
+    id: Optional[int] = None
+
 class Exercise(ExerciseBase):
     id: int
     workout_plan_id: int
@@ -105,6 +101,16 @@ class Exercise(ExerciseBase):
     class Config:
         from_attributes = True
 
+class RoutineCreate(BaseModel):
+    name: str
+    description: str | None = None
+    exercises: list[ExerciseCreate] = []
+
+class RoutineUpdate(BaseModel):
+    name: str | None = None
+    description: str | None = None
+    exercises: list[ExerciseUpdate] | None = None
+
 class WorkoutPlanBase(BaseModel):
     name: str
     description: str | None = None
@@ -112,6 +118,9 @@ class WorkoutPlanBase(BaseModel):
 class WorkoutPlanCreate(WorkoutPlanBase):
     exercises: list[ExerciseCreate]
 
+class WorkoutPlanUpdate(WorkoutPlanBase):
+    exercises: list[ExerciseUpdate]
+
 class WorkoutPlan(WorkoutPlanBase):
     id: int
     trainer_id: int
@@ -128,6 +137,9 @@ class MealBase(BaseModel):
 class MealCreate(MealBase):
     pass
 
+class MealUpdate(MealBase):
+    id: Optional[int] = None
+
 class Meal(MealBase):
     id: int
     nutrition_plan_id: int
@@ -142,6 +154,9 @@ class NutritionPlanBase(BaseModel):
 class NutritionPlanCreate(NutritionPlanBase):
     meals: list[MealCreate]
 
+class NutritionPlanUpdate(NutritionPlanBase):
+    meals: list[MealUpdate]
+
 class NutritionPlan(NutritionPlanBase):
     id: int
     trainer_id: int
@@ -150,6 +165,22 @@ class NutritionPlan(NutritionPlanBase):
     class Config:
         from_attributes = True
 
+class BulkPlanAssignment(BaseModel):
+    user_ids: list[int]
+    plan_ids: list[int]
+
+class TrainerStats(BaseModel):
+    users: int
+    workout_plans: int
+    nutrition_plans: int
+    routines: int
+    exercises: int
+    meals: int
+    workout_assignments: int
+    nutrition_assignments: int
+    exercises_per_plan: float
+    meals_per_plan: float
+
 class AdminLoginReset(BaseModel):
     email: EmailStr
 
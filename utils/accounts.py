@@ -0,0 +1,90 @@
+# utils/accounts.py
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, exists, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import env_flag
+from models import models
+from utils.assignments import insert_ignore
+
+# Desactivar una vez migrada la base (ver el INSERT de accounts en el README): evita recorrer
+# las tres tablas de principales en cada arranque
+ACCOUNTS_BACKFILL = env_flag("ACCOUNTS_BACKFILL", "true")
+
+ROLE_MODELS = {
+    "admin": models.Admin,
+    "trainer": models.Trainer,
+    "user": models.User,
+}
+
+def add_account(db, role: str, principal):
+    # El principal debe tener id (hacer flush antes de llamar)
+    db.add(models.Account(email=principal.email, role=role, principal_id=principal.id))
+
+async def update_account(db: AsyncSession, role: str, principal):
+    await db.execute(
+        update(models.Account).where(
+            models.Account.role == role,
+            models.Account.principal_id == principal.id
+        ).values(email=principal.email)
+    )
+
+async def remove_account(db: AsyncSession, role: str, principal_id: int):
+    await db.execute(
+        delete(models.Account).where(
+            models.Account.role == role,
+            models.Account.principal_id == principal_id
+        )
+    )
+
+async def ensure_email_available(db: AsyncSession, email: str, role: str | None = None,
+                                 principal_id: int | None = None, detail: str = "Email already registered"):
+    # accounts.email es único entre todos los roles: se comprueba aquí en vez de dejar que el INSERT falle
+    account = await get_account(db, email)
+    if account and (account.role, account.principal_id) != (role, principal_id):
+        raise HTTPException(status_code=400, detail=detail)
+
+async def get_account(db: AsyncSession, email: str):
+    return await db.scalar(select(models.Account).where(models.Account.email == email))
+
+async def resolve_account(db: AsyncSession, email: str):
+    # Una sola consulta por el índice de email; el join trae la fila del rol correspondiente
+    stmt = select(models.Account, models.Admin, models.Trainer, models.User).outerjoin(
+        models.Admin,
+        and_(models.Account.role == "admin", models.Admin.id == models.Account.principal_id)
+    ).outerjoin(
+        models.Trainer,
+        and_(models.Account.role == "trainer", models.Trainer.id == models.Account.principal_id)
+    ).outerjoin(
+        models.User,
+        and_(models.Account.role == "user", models.User.id == models.Account.principal_id)
+    ).where(models.Account.email == email)
+    row = (await db.execute(stmt)).first()
+
+    if row is None:
+        return None, None
+    account, admin, trainer, user = row
+    principal = {"admin": admin, "trainer": trainer, "user": user}.get(account.role)
+    return account.role, principal
+
+async def backfill_accounts(db: AsyncSession):
+    # Registra en el directorio los principales creados antes de que existiera. Con INSERT IGNORE /
+    # ON CONFLICT DO NOTHING es idempotente: varios workers arrancando a la vez, o dos filas con el
+    # mismo email en una tabla (que el NOT EXISTS no ve dentro de la misma sentencia), no fallan
+    if not ACCOUNTS_BACKFILL:
+        return
+    for role, model in ROLE_MODELS.items():
+        missing = select(model.email, literal(role), model.id).where(
+            model.email.isnot(None),
+            ~exists().where(
+                models.Account.role == role,
+                models.Account.principal_id == model.id
+            ),
+            ~exists().where(models.Account.email == model.email)
+        )
+        await db.execute(
+            insert_ignore(db, models.Account).from_select(
+                ["email", "role", "principal_id"], missing
+            )
+        )
+    await db.commit()
@@ -0,0 +1,51 @@
+# utils/assignments.py
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_BULK_ASSIGNMENTS = int(os.getenv("MAX_BULK_ASSIGNMENTS", "10000"))
+
+def insert_ignore(db: AsyncSession, table):
+    # INSERT idempotente: repetir una fila existente (asignación, resumen) no falla por clave duplicada.
+    # El rowcount debe contar solo las filas nuevas: con ON DUPLICATE KEY UPDATE y CLIENT.FOUND_ROWS
+    # (siempre activo en los dialectos MySQL de SQLAlchemy) los duplicados también contarían
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        return insert(table).prefix_with("IGNORE")
+    if dialect == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+async def owned_ids(db: AsyncSession, model, ids, trainer_id: int):
+    return set((await db.scalars(
+        select(model.id).where(model.id.in_(ids), model.trainer_id == trainer_id)
+    )).all())
+
+async def verify_owned(db: AsyncSession, model, ids, trainer_id: int, label: str):
+    missing = set(ids) - await owned_ids(db, model, ids, trainer_id)
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{label} not found: {', '.join(str(i) for i in sorted(missing))}"
+        )
+
+def unique_ids(user_ids, plan_ids):
+    user_ids, plan_ids = list(dict.fromkeys(user_ids)), list(dict.fromkeys(plan_ids))
+    if not user_ids or not plan_ids:
+        raise HTTPException(status_code=400, detail="user_ids and plan_ids must not be empty")
+    if len(user_ids) * len(plan_ids) > MAX_BULK_ASSIGNMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many assignments in one request (max {MAX_BULK_ASSIGNMENTS})"
+        )
+    return user_ids, plan_ids
+
+async def assign_plans(db: AsyncSession, association, plan_column: str, user_ids, plan_ids):
+    # Una sola sentencia multi-fila para todo el producto usuarios x planes;
+    # devuelve cuántas asignaciones eran nuevas
+    rows = [{"user_id": user_id, plan_column: plan_id} for user_id in user_ids for plan_id in plan_ids]
+    result = await db.execute(insert_ignore(db, association).values(rows))
+    return result.rowcount
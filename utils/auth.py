@@ -1,12 +1,19 @@
 # utils/auth.py
+import hashlib
+import time
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from config.database import get_db
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import env_flag, get_async_db
+from utils.cache import TTLCache
+from utils.hashing import map_in_hash_pool, run_in_hash_pool
+from utils.token_versions import forget_token_version, get_token_version
 import os
 
 from models import models
@@ -15,6 +22,19 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Caché de principales autenticados, clave (rol, sub)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Claims ya verificados, clave digest del token; cada entrada caduca con el "exp" del token
+CLAIMS_CACHE_SIZE = int(os.getenv("CLAIMS_CACHE_SIZE", "10000"))
+claims_cache = TTLCache(maxsize=CLAIMS_CACHE_SIZE)
+
+# Opcional: los tokens llevan id ("uid") y versión ("ver") del principal; las rutas de
+# entrenador y admin autorizan solo con los claims, sin cargar la fila
+ENRICHED_TOKENS = env_flag("ENRICHED_TOKENS")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -24,6 +44,37 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    return await run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_in_hash_pool(get_password_hash, password)
+
+async def get_password_hashes_async(passwords):
+    # Importaciones: esperan hueco en el pool en vez de abortar con 503 a mitad del fichero
+    return await map_in_hash_pool(get_password_hash, passwords, wait=True)
+
+def principal_snapshot(principal):
+    # Copia desacoplada de la sesión: se comparte entre peticiones sin recargar la fila
+    return SimpleNamespace(**{
+        attr.key: getattr(principal, attr.key)
+        for attr in sa_inspect(principal).mapper.column_attrs
+        if attr.key != "hashed_password"
+    })
+
+def invalidate_principal(role: str, *emails, principal_id: int | None = None):
+    for email in emails:
+        principal_cache.pop((role, email))
+    if principal_id is not None:
+        forget_token_version(role, principal_id)
+
+async def token_claims(db: AsyncSession, role: str, principal) -> dict:
+    claims = {"sub": principal.email, "role": role}
+    if ENRICHED_TOKENS:
+        claims["uid"] = principal.id
+        claims["ver"] = await get_token_version(db, role, principal.id)
+    return claims
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,9 +85,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_token(token: str) -> dict:
+    # Un token repetido cuesta un hash y una búsqueda; solo se cachean tokens válidos con exp
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = claims_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = exp - time.time()
+            if ttl > 0:
+                claims_cache.set(key, payload, ttl=ttl)
+    return payload
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -44,23 +108,36 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         role: str = payload.get("role")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    if role == "admin":
-        user = db.query(models.Admin).filter(models.Admin.email == email).first()
-    elif role == "trainer":
-        user = db.query(models.Trainer).filter(models.Trainer.email == email).first()
-    else:
-        user = db.query(models.User).filter(models.User.email == email).first()
-    
+
+    principal_id = payload.get("uid")
+    if ENRICHED_TOKENS and principal_id is not None:
+        # Un cambio de contraseña o una baja suben la versión y dejan fuera los tokens anteriores
+        if payload.get("ver") != await get_token_version(db, role, principal_id):
+            raise credentials_exception
+        if role in ("admin", "trainer"):
+            # Sus rutas solo usan id y email del principal
+            return {"user": SimpleNamespace(id=principal_id, email=email), "role": role}
+
+    user = principal_cache.get((role, email))
     if user is None:
-        raise credentials_exception
+        if role == "admin":
+            user = await db.scalar(select(models.Admin).where(models.Admin.email == email))
+        elif role == "trainer":
+            user = await db.scalar(select(models.Trainer).where(models.Trainer.email == email))
+        else:
+            user = await db.scalar(select(models.User).where(models.User.email == email))
+        
+        if user is None:
+            raise credentials_exception
+        user = principal_snapshot(user)
+        principal_cache.set((role, email), user)
     return {"user": user, "role": role}
 
 async def get_current_admin(current_user = Depends(get_current_user)):
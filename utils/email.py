@@ -3,21 +3,55 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 
-def send_reset_email(email: str, token: str):
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = int(os.getenv("SMTP_PORT"))
-    smtp_username = os.getenv("SMTP_USERNAME")
-    smtp_password = os.getenv("SMTP_PASSWORD")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Desactivar para servidores locales de prueba (p. ej. aiosmtpd) sin TLS
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes", "on")
 
+def build_message(recipient: str, subject: str, body: str):
     msg = MIMEMultipart()
-    msg['From'] = smtp_username
-    msg['To'] = email
-    msg['Subject'] = "Recuperación de contraseña"
-    
-    body = f"Tu token de recuperación es: {token}"
+    msg['From'] = os.getenv("SMTP_FROM") or os.getenv("SMTP_USERNAME")
+    msg['To'] = recipient
+    msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
+    return msg
 
-    with smtplib.SMTP(smtp_server, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.send_message(msg)
\ No newline at end of file
+def reset_email(token: str):
+    return "Recuperación de contraseña", f"Tu token de recuperación es: {token}"
+
+class SMTPConnection:
+    # Sesión SMTP autenticada que se reutiliza entre envíos; se reabre si el servidor la corta
+    def __init__(self):
+        self._server = None
+
+    def _connect(self):
+        smtp_username = os.getenv("SMTP_USERNAME")
+        smtp_password = os.getenv("SMTP_PASSWORD")
+        server = smtplib.SMTP(os.getenv("SMTP_SERVER"), int(os.getenv("SMTP_PORT")), timeout=SMTP_TIMEOUT)
+        try:
+            if SMTP_STARTTLS:
+                server.starttls()
+            if smtp_username:
+                server.login(smtp_username, smtp_password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def send(self, msg):
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Conexión caducada en el relay: un reintento con sesión nueva
+            self.close()
+            self._connect()
+            self._server.send_message(msg)
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
+            self._server = None
@@ -0,0 +1,112 @@
+# utils/export.py
+import csv
+import io
+import json
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from config.database import AsyncSessionLocal
+from models import models
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Se acumula la salida hasta este tamaño antes de enviarla para no emitir un chunk por fila
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# recurso -> (modelo, columnas, hijos opcionales: (modelo, fk, clave en el JSON, columnas))
+EXPORTS = {
+    "users": (models.User, ("id", "email", "full_name", "trainer_id"), None),
+    "trainers": (models.Trainer, ("id", "email", "full_name", "admin_id"), None),
+    "routines": (models.Routine, ("id", "name", "description", "trainer_id"), None),
+    "workout-plans": (
+        models.WorkoutPlan, ("id", "name", "description", "trainer_id"),
+        (models.Exercise, "workout_plan_id", "exercises", ("id", "name", "sets", "reps")),
+    ),
+    "nutrition-plans": (
+        models.NutritionPlan, ("id", "name", "description", "trainer_id"),
+        (models.Meal, "nutrition_plan_id", "meals", ("id", "name", "description", "calories")),
+    ),
+}
+
+def get_export(resource: str, fmt: str):
+    if resource not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export resource")
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+    return EXPORTS[resource]
+
+def _statement(model, columns, children):
+    stmt = select(*[getattr(model, column) for column in columns])
+    if children is None:
+        return stmt.order_by(model.id)
+    child_model, parent_key, _, child_columns = children
+    # Join ordenado por padre: los hijos de cada plan llegan seguidos y se agrupan al vuelo
+    return (
+        stmt.add_columns(*[getattr(child_model, column).label(f"child_{column}") for column in child_columns])
+        .outerjoin(child_model, getattr(child_model, parent_key) == model.id)
+        .order_by(model.id, child_model.id)
+    )
+
+def _csv_header(columns, children):
+    if children is None:
+        return list(columns)
+    _, _, key, child_columns = children
+    prefix = key[:-1]
+    return list(columns) + [f"{prefix}_{column}" for column in child_columns]
+
+async def _rows(stmt):
+    # Cursor del lado del servidor: solo hay EXPORT_BATCH_SIZE filas en memoria a la vez
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            for row in partition:
+                yield tuple(row)
+
+async def _ndjson_lines(rows, columns, children):
+    if children is None:
+        async for row in rows:
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+        return
+    # Solo se mantiene en memoria el plan en curso con sus hijos
+    _, _, key, child_columns = children
+    width = len(columns)
+    record = None
+    async for row in rows:
+        if record is None or record["id"] != row[0]:
+            if record is not None:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            record = dict(zip(columns, row[:width]))
+            record[key] = []
+        if row[width] is not None:
+            record[key].append(dict(zip(child_columns, row[width:])))
+    if record is not None:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+async def _csv_lines(rows, columns, children):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_csv_header(columns, children))
+    async for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+async def stream_export(resource: str, fmt: str):
+    model, columns, children = EXPORTS[resource]
+    rows = _rows(_statement(model, columns, children))
+    lines = _csv_lines(rows, columns, children) if fmt == "csv" else _ndjson_lines(rows, columns, children)
+
+    chunk, size = [], 0
+    async for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode()
@@ -0,0 +1,40 @@
+# utils/fast_json.py
+from typing import List
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from config.database import env_flag
+import schemas.schemas as schemas
+
+# Opcional: serializa los listados en un solo paso (validación + JSON en pydantic-core)
+# y usa orjson para el resto de respuestas en lugar del json de la stdlib
+FAST_JSON = env_flag("FAST_JSON")
+
+if FAST_JSON:
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+else:
+    DefaultResponse = JSONResponse
+
+# Adaptadores construidos una vez al importar; construirlos por petición cuesta más que serializar
+LIST_ADAPTERS = {
+    schema: TypeAdapter(List[schema])
+    for schema in (
+        schemas.User,
+        schemas.Trainer,
+        schemas.Plan,
+        schemas.Routine,
+        schemas.WorkoutPlan,
+        schemas.NutritionPlan,
+    )
+}
+
+def list_response(schema, rows, response: Response):
+    # Sin FAST_JSON se devuelven las filas y FastAPI aplica response_model como siempre
+    if not FAST_JSON:
+        return rows
+    adapter = LIST_ADAPTERS[schema]
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    # Las cabeceras del Response inyectado (p. ej. X-Next-Cursor) no se copian solas
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
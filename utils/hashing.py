@@ -0,0 +1,91 @@
+# utils/hashing.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+# bcrypt libera el GIL mientras calcula el hash, así que un pool de hilos
+# basta para usar todos los núcleos sin bloquear el event loop.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_stats_lock = threading.Lock()
+_pending = 0
+# Se activa cada vez que termina una tarea: despierta a los que esperan hueco en la cola
+_slot_freed = asyncio.Event()
+
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "queue_seconds": 0.0,
+    "run_seconds": 0.0,
+    "max_run_seconds": 0.0,
+}
+
+def _timed_call(func, args, submitted_at):
+    started_at = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        run_seconds = time.perf_counter() - started_at
+        with _stats_lock:
+            _stats["completed"] += 1
+            _stats["queue_seconds"] += started_at - submitted_at
+            _stats["run_seconds"] += run_seconds
+            _stats["max_run_seconds"] = max(_stats["max_run_seconds"], run_seconds)
+
+async def run_in_hash_pool(func, *args, wait: bool = False):
+    global _pending
+    # Los trabajos por lotes (wait=True) esperan hueco en la cola en vez de fallar a mitad
+    while wait and _pending >= HASH_WORKERS + HASH_QUEUE_LIMIT:
+        _slot_freed.clear()
+        await _slot_freed.wait()
+    # Rechazar en vez de encolar sin límite durante una avalancha de logins
+    if _pending >= HASH_WORKERS + HASH_QUEUE_LIMIT:
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+    _pending += 1
+    with _stats_lock:
+        _stats["submitted"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _executor, _timed_call, func, args, time.perf_counter()
+        )
+    finally:
+        _pending -= 1
+        _slot_freed.set()
+
+def hashing_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    completed = stats["completed"] or 1
+    stats.update({
+        "workers": HASH_WORKERS,
+        "queue_limit": HASH_QUEUE_LIMIT,
+        "pending": _pending,
+        "avg_queue_seconds": stats["queue_seconds"] / completed,
+        "avg_run_seconds": stats["run_seconds"] / completed,
+    })
+    return stats
+
+async def map_in_hash_pool(func, items, wait: bool = False):
+    # Mantiene como mucho HASH_WORKERS tareas en vuelo para no agotar la cola compartida
+    semaphore = asyncio.Semaphore(HASH_WORKERS)
+
+    async def run(item):
+        async with semaphore:
+            return await run_in_hash_pool(func, item, wait=wait)
+
+    return await asyncio.gather(*(run(item) for item in items))
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.models import Admin
 from utils.auth import get_password_hash
+from utils.accounts import add_account
 
 def create_initial_admin(db: Session):
     # Verificar si ya existe un admin
@@ -16,6 +17,8 @@ def create_initial_admin(db: Session):
         full_name="Administrador Principal"
     )
     db.add(admin)
+    db.flush()
+    add_account(db, "admin", admin)
     db.commit()
     db.refresh(admin)
     print("\n=== Usuario Administrador Registrado ===")
@@ -0,0 +1,76 @@
+# utils/lifecycle.py
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import exc, text
+
+from config.database import IS_SQLITE, POOL_OPTIONS, async_engine, env_flag
+import models.models as models
+from utils.auth import get_password_hash_async
+
+# Desactivar DB_CREATE_ALL cuando el esquema lo gestionan migraciones
+DB_CREATE_ALL = env_flag("DB_CREATE_ALL", "true")
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "1" if IS_SQLITE else str(POOL_OPTIONS["pool_size"])))
+STARTUP_DB_RETRIES = int(os.getenv("STARTUP_DB_RETRIES", "5"))
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+# Estado del arranque; /readyz responde 503 hasta que ready sea True
+startup_report = {
+    "ready": False,
+    "import_seconds": None,
+    "startup_seconds": None,
+    "steps": {},
+}
+
+async def with_db_retries(step):
+    # Un corte breve de la base durante el arranque se reintenta en vez de tumbar el worker
+    for attempt in range(STARTUP_DB_RETRIES + 1):
+        try:
+            return await step()
+        except (exc.OperationalError, exc.InterfaceError, OSError) as e:
+            if attempt == STARTUP_DB_RETRIES:
+                raise
+            delay = min(2 ** attempt, 30)
+            logger.warning("Database not available during startup (%s), retrying in %ss", e, delay)
+            await asyncio.sleep(delay)
+
+async def timed_step(name: str, step):
+    started = time.perf_counter()
+    result = await step()
+    startup_report["steps"][name] = round(time.perf_counter() - started, 4)
+    return result
+
+async def ensure_schema():
+    if not DB_CREATE_ALL:
+        return
+    async with async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+async def warm_pool():
+    # Abre DB_POOL_WARM conexiones a la vez para que las primeras peticiones no paguen el connect
+    connections = []
+    try:
+        for _ in range(DB_POOL_WARM):
+            connections.append(async_engine.connect())
+        await asyncio.gather(*(conn.start() for conn in connections))
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections), return_exceptions=True)
+
+async def warm_bcrypt():
+    # Carga el backend de passlib/bcrypt y arranca el pool de hilos antes del primer login
+    await get_password_hash_async("warm-up")
+
+async def _ping():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def check_database():
+    # Latencia de un SELECT 1 incluyendo la espera por una conexión del pool
+    started = time.perf_counter()
+    await asyncio.wait_for(_ping(), READINESS_TIMEOUT)
+    return time.perf_counter() - started
@@ -0,0 +1,357 @@
+# utils/metrics.py
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Límites en segundos, pensados para esperas de conexión y latencias de ruta
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.wait_seconds = Histogram()
+        self.counters = {
+            "connects": 0,
+            "closes": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "invalidations": 0,
+            "timeouts": 0,
+        }
+        self._lock = threading.Lock()
+
+    def incr(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            counters = dict(self.counters)
+        snapshot = {"pool": pool.status(), **counters}
+        # La rotación de conexiones es lo que delata recycle/pre-ping mal ajustados
+        snapshot["churn"] = counters["connects"] + counters["closes"]
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        snapshot["wait_seconds"] = self.wait_seconds.snapshot()
+        return snapshot
+
+class _TimedConnectMixin:
+    # connect() cubre la espera en la cola y la apertura de conexiones nuevas
+    metrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.incr("timeouts")
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.wait_seconds.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+class InstrumentedQueuePool(_TimedConnectMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_TimedConnectMixin, AsyncAdaptedQueuePool):
+    pass
+
+def instrument_pool(pool, name: str) -> PoolMetrics:
+    metrics = PoolMetrics(name)
+    pool.metrics = metrics
+
+    event.listen(pool, "connect", lambda *args: metrics.incr("connects"))
+    event.listen(pool, "close", lambda *args: metrics.incr("closes"))
+    event.listen(pool, "checkout", lambda *args: metrics.incr("checkouts"))
+    event.listen(pool, "checkin", lambda *args: metrics.incr("checkins"))
+    event.listen(pool, "invalidate", lambda *args: metrics.incr("invalidations"))
+    return metrics
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        # (sentencia, parámetros, executemany) para poder repetirlas con EXPLAIN
+        self.executions = []
+
+@contextmanager
+def count_queries(engine):
+    # Cuenta las sentencias enviadas al driver; acepta engines sync o async
+    counter = QueryCounter()
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.count += 1
+        counter.statements.append(statement)
+        counter.executions.append((statement, parameters, executemany))
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+# --- Métricas por petición -------------------------------------------------
+
+# Consultas por petición; los listados deberían quedarse en los primeros cubos
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+# Estadísticas de la petición en curso; la middleware la fija y los hooks SQL la actualizan
+current_request = contextvars.ContextVar("current_request", default=None)
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses = {}
+
+class RequestMetrics:
+    def __init__(self):
+        self.routes = {}
+        # Sentencias fuera de una petición (tareas en segundo plano, arranque)
+        self.background_queries = 0
+        self.background_db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def route(self, method: str, template: str) -> RouteMetrics:
+        key = (method, template)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self.routes.setdefault(key, RouteMetrics())
+        return metrics
+
+    def observe(self, method: str, template: str, status: int, seconds: float, stats: RequestStats):
+        metrics = self.route(method, template)
+        metrics.latency.observe(seconds)
+        metrics.queries.observe(stats.queries)
+        with self._lock:
+            metrics.db_seconds += stats.db_seconds
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def observe_background(self, seconds: float):
+        with self._lock:
+            self.background_queries += 1
+            self.background_db_seconds += seconds
+
+request_metrics = RequestMetrics()
+
+def instrument_engine(engine):
+    # Atribuye cada sentencia y su tiempo a la petición activa (o a segundo plano)
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = current_request.get()
+        if stats is None:
+            request_metrics.observe_background(elapsed)
+        else:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    def handle_error(exception_context):
+        # Las sentencias que fallan no llegan a after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+class RequestMetricsMiddleware:
+    # Middleware ASGI pura: no envuelve el cuerpo, así que no afecta a las respuestas en streaming
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            # Se etiqueta por plantilla ("/trainer/users/{user_id}") para acotar la cardinalidad
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            request_metrics.observe(
+                scope["method"], template, status, time.perf_counter() - started, stats
+            )
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str):
+    snapshot = histogram.snapshot()
+    for bound, count in snapshot["buckets"].items():
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+    yield f"{name}_sum{{{labels}}} {snapshot['sum']}"
+    yield f"{name}_count{{{labels}}} {snapshot['count']}"
+
+def render_prometheus(pools: dict, hashing: dict | None = None, caches: dict | None = None) -> str:
+    # Formato de texto de Prometheus (versión 0.0.4)
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route template",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    routes = sorted(request_metrics.routes.items())
+    for (method, template), metrics in routes:
+        lines.extend(_histogram_lines(
+            "http_request_duration_seconds", metrics.latency, _labels(method=method, route=template)
+        ))
+
+    lines += [
+        "# HELP http_request_db_queries SQL statements issued per request",
+        "# TYPE http_request_db_queries histogram",
+    ]
+    for (method, template), metrics in routes:
+        lines.extend(_histogram_lines(
+            "http_request_db_queries", metrics.queries, _labels(method=method, route=template)
+        ))
+
+    lines += [
+        "# HELP http_request_db_seconds_total Time spent executing SQL, by route template",
+        "# TYPE http_request_db_seconds_total counter",
+    ]
+    for (method, template), metrics in routes:
+        lines.append(
+            f"http_request_db_seconds_total{{{_labels(method=method, route=template)}}} {metrics.db_seconds}"
+        )
+
+    lines += [
+        "# HELP http_requests_total Requests by route template and status code",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, template), metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            labels = _labels(method=method, route=template, status=status)
+            lines.append(f"http_requests_total{{{labels}}} {count}")
+
+    lines += [
+        "# HELP db_background_queries_total SQL statements issued outside a request",
+        "# TYPE db_background_queries_total counter",
+        f"db_background_queries_total {request_metrics.background_queries}",
+        "# HELP db_background_seconds_total Time spent on SQL outside a request",
+        "# TYPE db_background_seconds_total counter",
+        f"db_background_seconds_total {request_metrics.background_db_seconds}",
+    ]
+
+    # Cada familia de métricas va agrupada: primero la métrica, luego un valor por pool
+    for counter in ("connects", "closes", "checkouts", "checkins", "invalidations", "timeouts"):
+        lines.append(f"# TYPE db_pool_{counter}_total counter")
+        for pool_name, snapshot in pools.items():
+            lines.append(f"db_pool_{counter}_total{{{_labels(pool=pool_name)}}} {snapshot[counter]}")
+    for gauge in ("size", "checked_out", "checked_in", "overflow"):
+        values = [(name, snapshot[gauge]) for name, snapshot in pools.items() if gauge in snapshot]
+        if values:
+            lines.append(f"# TYPE db_pool_{gauge} gauge")
+            lines.extend(f"db_pool_{gauge}{{{_labels(pool=name)}}} {value}" for name, value in values)
+    lines.append("# TYPE db_pool_wait_seconds histogram")
+    for pool_name, snapshot in pools.items():
+        labels = _labels(pool=pool_name)
+        wait = snapshot["wait_seconds"]
+        for bound, count in wait["buckets"].items():
+            lines.append(f'db_pool_wait_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f"db_pool_wait_seconds_sum{{{labels}}} {wait['sum']}")
+        lines.append(f"db_pool_wait_seconds_count{{{labels}}} {wait['count']}")
+
+    if hashing:
+        # Pool de bcrypt: tareas, rechazos por cola llena, espera en cola y tiempo de cálculo
+        lines += [
+            "# TYPE bcrypt_submitted_total counter",
+            f"bcrypt_submitted_total {hashing['submitted']}",
+            "# TYPE bcrypt_completed_total counter",
+            f"bcrypt_completed_total {hashing['completed']}",
+            "# TYPE bcrypt_rejected_total counter",
+            f"bcrypt_rejected_total {hashing['rejected']}",
+            "# TYPE bcrypt_queue_seconds_total counter",
+            f"bcrypt_queue_seconds_total {hashing['queue_seconds']}",
+            "# TYPE bcrypt_run_seconds_total counter",
+            f"bcrypt_run_seconds_total {hashing['run_seconds']}",
+            "# TYPE bcrypt_max_run_seconds gauge",
+            f"bcrypt_max_run_seconds {hashing['max_run_seconds']}",
+            "# TYPE bcrypt_pending gauge",
+            f"bcrypt_pending {hashing['pending']}",
+            "# TYPE bcrypt_workers gauge",
+            f"bcrypt_workers {hashing['workers']}",
+            "# TYPE bcrypt_queue_limit gauge",
+            f"bcrypt_queue_limit {hashing['queue_limit']}",
+        ]
+
+    if caches:
+        # Cachés en memoria del proceso (principales, claims, versiones de token, /user/plans/)
+        for counter in ("hits", "misses"):
+            lines.append(f"# TYPE cache_{counter}_total counter")
+            lines.extend(
+                f"cache_{counter}_total{{{_labels(cache=name)}}} {stats[counter]}" for name, stats in caches.items()
+            )
+        for gauge in ("size", "maxsize"):
+            lines.append(f"# TYPE cache_{gauge} gauge")
+            lines.extend(f"cache_{gauge}{{{_labels(cache=name)}}} {stats[gauge]}" for name, stats in caches.items())
+
+    return "\n".join(lines) + "\n"
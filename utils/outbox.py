@@ -0,0 +1,132 @@
+# utils/outbox.py
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal
+from models import models
+from utils.email import SMTPConnection, build_message, reset_email
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "8"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+# Despierta al emisor en cuanto hay un mensaje nuevo en este proceso
+_wakeup = asyncio.Event()
+
+def enqueue_email(db: AsyncSession, recipient: str, subject: str, body: str):
+    # Se guarda en la transacción del llamador; tras el commit hay que llamar a notify_outbox()
+    db.add(models.EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        next_attempt_at=datetime.utcnow(),
+    ))
+
+def queue_reset_email(db: AsyncSession, email: str, token: str):
+    subject, body = reset_email(token)
+    enqueue_email(db, email, subject, body)
+
+def notify_outbox():
+    _wakeup.set()
+
+def retry_delay(attempts: int) -> float:
+    delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), EMAIL_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+async def claim_batch(db: AsyncSession):
+    # SKIP LOCKED deja que varios workers repartan el lote sin enviar dos veces el mismo mensaje
+    now = datetime.utcnow()
+    rows = (await db.scalars(
+        select(models.EmailOutbox)
+        .where(models.EmailOutbox.status == "pending", models.EmailOutbox.next_attempt_at <= now)
+        .order_by(models.EmailOutbox.next_attempt_at)
+        .limit(EMAIL_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if rows:
+        # Arrendamiento: si el proceso muere a mitad de envío, el mensaje vuelve a la cola
+        await db.execute(
+            update(models.EmailOutbox)
+            .where(models.EmailOutbox.id.in_([row.id for row in rows]))
+            .values(next_attempt_at=now + timedelta(seconds=EMAIL_LEASE_SECONDS))
+        )
+    await db.commit()
+    return rows
+
+def send_batch(connection: SMTPConnection, rows):
+    # Se ejecuta en un hilo: todo el lote comparte la misma sesión SMTP
+    errors = {}
+    for row in rows:
+        try:
+            connection.send(build_message(row.recipient, row.subject, row.body))
+        except Exception as e:
+            errors[row.id] = f"{type(e).__name__}: {e}"
+    return errors
+
+async def record_results(db: AsyncSession, rows, errors):
+    sent_ids = [row.id for row in rows if row.id not in errors]
+    if sent_ids:
+        # Los enviados se borran: la tabla no crece y el token no queda en claro
+        await db.execute(delete(models.EmailOutbox).where(models.EmailOutbox.id.in_(sent_ids)))
+    now = datetime.utcnow()
+    for row in rows:
+        if row.id not in errors:
+            continue
+        attempts = row.attempts + 1
+        values = {"attempts": attempts, "last_error": errors[row.id][:1000]}
+        if attempts >= EMAIL_MAX_ATTEMPTS:
+            # Se conserva para diagnóstico, pero sin el cuerpo: el token de reseteo iba en claro
+            values.update(status="failed", body="")
+            logger.error("Giving up on email %s to %s: %s", row.id, row.recipient, errors[row.id])
+        else:
+            values["next_attempt_at"] = now + timedelta(seconds=retry_delay(attempts))
+        await db.execute(update(models.EmailOutbox).where(models.EmailOutbox.id == row.id).values(**values))
+    await db.commit()
+
+async def process_outbox(connection: SMTPConnection):
+    # Devuelve cuántos mensajes se procesaron en este lote
+    async with AsyncSessionLocal() as db:
+        rows = await claim_batch(db)
+        if not rows:
+            return 0
+        errors = await asyncio.to_thread(send_batch, connection, rows)
+        await record_results(db, rows, errors)
+        return len(rows)
+
+async def run_outbox_sender():
+    connection = SMTPConnection()
+    loop = asyncio.get_running_loop()
+    last_sent = None
+    try:
+        while True:
+            _wakeup.clear()
+            try:
+                processed = await process_outbox(connection)
+            except Exception:
+                logger.exception("Email outbox iteration failed")
+                processed = 0
+            if processed:
+                last_sent = loop.time()
+                continue
+            # La sesión SMTP se mantiene abierta entre ráfagas y se cierra tras un rato sin envíos
+            if last_sent is not None and loop.time() - last_sent >= SMTP_IDLE_SECONDS:
+                await asyncio.to_thread(connection.close)
+                last_sent = None
+            try:
+                await asyncio.wait_for(_wakeup.wait(), EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        connection.close()
@@ -0,0 +1,45 @@
+# utils/pagination.py
+import base64
+import json
+import os
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(
+    db: AsyncSession,
+    stmt,
+    key,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+):
+    # Paginación por clave (id > cursor) usando el índice; skip/limit se mantiene por compatibilidad
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        stmt = stmt.where(key > decode_cursor(cursor))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    # Se pide una fila extra para saber si hay página siguiente sin un COUNT
+    rows = (await db.scalars(stmt.order_by(key).limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
@@ -0,0 +1,92 @@
+# utils/plan_children.py
+import os
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_CLONE_COUNT = int(os.getenv("MAX_CLONE_COUNT", "100"))
+
+EXERCISE_FIELDS = ("name", "sets", "reps")
+MEAL_FIELDS = ("name", "description", "calories")
+
+async def sync_children(db: AsyncSession, model, parent_key: str, parent_id: int, items, fields, label: str):
+    # Reconcilia los hijos por diferencias en vez de borrar y reinsertar; solo escribe lo que cambia.
+    # Devuelve (si hubo cambios, variación neta del número de hijos)
+    parent_column = getattr(model, parent_key)
+    columns = [getattr(model, field) for field in fields]
+    existing = {
+        row.id: tuple(getattr(row, field) for field in fields)
+        for row in (await db.execute(select(model.id, *columns).where(parent_column == parent_id))).all()
+    }
+
+    updates, unmatched = [], []
+    for item in items:
+        values = tuple(getattr(item, field) for field in fields)
+        item_id = getattr(item, "id", None)
+        if item_id is None:
+            unmatched.append(values)
+            continue
+        if item_id not in existing:
+            raise HTTPException(status_code=400, detail=f"{label} {item_id} does not belong to this plan")
+        if existing.pop(item_id) != values:
+            updates.append({"id": item_id, **dict(zip(fields, values))})
+
+    # Los hijos sin id se emparejan primero con filas idénticas y después reutilizan las sobrantes
+    free = {}
+    for row_id, values in existing.items():
+        free.setdefault(values, []).append(row_id)
+    inserts = []
+    for values in unmatched:
+        if free.get(values):
+            existing.pop(free[values].pop(0))
+        else:
+            inserts.append(values)
+
+    new_rows = []
+    for values in inserts:
+        if existing:
+            row_id = next(iter(existing))
+            existing.pop(row_id)
+            updates.append({"id": row_id, **dict(zip(fields, values))})
+        else:
+            new_rows.append({parent_key: parent_id, **dict(zip(fields, values))})
+
+    if existing:
+        await db.execute(delete(model).where(model.id.in_(list(existing))))
+    if updates:
+        await db.execute(update(model), updates)
+    if new_rows:
+        await db.execute(insert(model).values(new_rows))
+    return bool(existing or updates or new_rows), len(new_rows) - len(existing)
+
+async def clone_plan(db: AsyncSession, plan_model, child_model, parent_key: str, source, fields, count: int):
+    # Copia el plan y sus hijos dentro de la base de datos con sentencias por conjuntos.
+    # Devuelve (ids nuevos, número de hijos copiados)
+    if not 1 <= count <= MAX_CLONE_COUNT:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_CLONE_COUNT}")
+
+    # Nombre temporal único para recuperar los ids nuevos sin depender de RETURNING ni de lastrowid
+    token = f"clone:{uuid.uuid4().hex}"
+    await db.execute(insert(plan_model).values([
+        {"name": token, "description": source.description, "trainer_id": source.trainer_id}
+    ] * count))
+    new_ids = (await db.scalars(
+        select(plan_model.id)
+        .where(plan_model.trainer_id == source.trainer_id, plan_model.name == token)
+        .order_by(plan_model.id)
+    )).all()
+
+    parent_column = getattr(child_model, parent_key)
+    columns = [getattr(child_model, field) for field in fields]
+    copied = await db.execute(insert(child_model).from_select(
+        [*fields, parent_key],
+        select(*columns, plan_model.id)
+        .select_from(child_model)
+        .join(plan_model, plan_model.id.in_(new_ids))
+        .where(parent_column == source.id)
+        .order_by(plan_model.id, child_model.id)
+    ))
+    await db.execute(update(plan_model).where(plan_model.id.in_(new_ids)).values(name=source.name))
+    return new_ids, copied.rowcount
@@ -0,0 +1,155 @@
+# utils/rate_limit.py
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from config.database import env_flag
+
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", "true")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Detrás de proxies de confianza la IP real llega en X-Forwarded-For: cada proxy añade a la
+# derecha la dirección de la que recibió la petición, así que con N proxies el cliente es la
+# entrada N-ésima empezando por la derecha. Lo que haya más a la izquierda lo escribe el cliente.
+# RATE_LIMIT_TRUST_FORWARDED=true equivale a un solo proxy
+RATE_LIMIT_TRUST_FORWARDED = env_flag("RATE_LIMIT_TRUST_FORWARDED")
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "1" if RATE_LIMIT_TRUST_FORWARDED else "0"))
+
+# (límite, ventana en segundos) por ámbito
+RATE_LIMITS = {
+    "login:ip": (int(os.getenv("LOGIN_RATE_LIMIT_IP", "30")), int(os.getenv("LOGIN_RATE_LIMIT_WINDOW", "60"))),
+    "login:email": (int(os.getenv("LOGIN_RATE_LIMIT_EMAIL", "10")), int(os.getenv("LOGIN_RATE_LIMIT_WINDOW", "60"))),
+    "reset:ip": (int(os.getenv("RESET_RATE_LIMIT_IP", "10")), int(os.getenv("RESET_RATE_LIMIT_WINDOW", "900"))),
+    "reset:email": (int(os.getenv("RESET_RATE_LIMIT_EMAIL", "3")), int(os.getenv("RESET_RATE_LIMIT_WINDOW", "900"))),
+    # Canje de tokens de reseteo
+    "redeem:ip": (int(os.getenv("RESET_RATE_LIMIT_IP", "10")), int(os.getenv("RESET_RATE_LIMIT_WINDOW", "900"))),
+}
+
+def sliding_window(now: float, window: int, limit: int, index: int, current: int, previous: int):
+    # Contador de ventana deslizante: la ventana anterior pesa según cuánto queda de ella.
+    # Devuelve (índice, actual, anterior, segundos de espera o None si se admite)
+    new_index = int(now // window)
+    if new_index != index:
+        previous = current if new_index == index + 1 else 0
+        current = 0
+        index = new_index
+    offset = now - index * window
+    estimate = previous * (1 - offset / window) + current
+    if estimate + 1 <= limit:
+        return index, current + 1, previous, None
+
+    if current + 1 > limit:
+        # La ventana actual ya está llena: hay que esperar a la siguiente y, dentro de ella, a que
+        # el peso de esta (que pasa a ser la anterior) deje sitio para una petición más
+        retry_after = window - offset + max(0.0, 1 - (limit - 1) / current) * window
+    else:
+        # Momento en que el peso de la ventana anterior deja sitio para una petición más
+        retry_after = (1 - (limit - current - 1) / previous) * window - offset
+    return index, current, previous, max(1, math.ceil(retry_after))
+
+class MemoryRateLimitBackend:
+    # Un solo proceso: tres enteros por clave y LRU acotada; solo se usa desde el event loop
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: int):
+        now = time.monotonic()
+        index, current, previous = self._windows.get(key, (0, 0, 0))
+        index, current, previous, retry_after = sliding_window(now, window, limit, index, current, previous)
+        self._windows[key] = (index, current, previous)
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return retry_after
+
+    async def refund(self, key: str, window: int):
+        entry = self._windows.get(key)
+        if entry is not None:
+            index, current, previous = entry
+            # Si la ventana ya cambió, el intento cuenta en la anterior con un peso decreciente
+            if index == int(time.monotonic() // window) and current:
+                self._windows[key] = (index, current - 1, previous)
+
+    async def reset(self, key: str, window: int):
+        self._windows.pop(key, None)
+
+class RedisRateLimitBackend:
+    # Compartido entre procesos; requiere el paquete "redis". Una clave por ventana con
+    # expiración, así Redis libera solo las claves inactivas
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+
+    async def hit(self, key: str, limit: int, window: int):
+        now = time.time()
+        index = int(now // window)
+        current_key, previous_key = f"ratelimit:{key}:{index}", f"ratelimit:{key}:{index - 1}"
+        current, previous = await self.client.mget(current_key, previous_key)
+        current, previous = int(current or 0), int(previous or 0)
+        _, _, _, retry_after = sliding_window(now, window, limit, index, current, previous)
+        if retry_after is None:
+            # Lectura e incremento no son atómicos: con carrera se admite alguna petición de más
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.incr(current_key)
+                pipe.expire(current_key, window * 2)
+                await pipe.execute()
+        return retry_after
+
+    async def refund(self, key: str, window: int):
+        current_key = f"ratelimit:{key}:{int(time.time() // window)}"
+        # Sin atomicidad con hit(): en una carrera el contador puede quedar una unidad por debajo
+        if int(await self.client.get(current_key) or 0) > 0:
+            await self.client.decr(current_key)
+
+    async def reset(self, key: str, window: int):
+        index = int(time.time() // window)
+        await self.client.delete(f"ratelimit:{key}:{index}", f"ratelimit:{key}:{index - 1}")
+
+BACKENDS = {
+    "memory": MemoryRateLimitBackend,
+    "redis": RedisRateLimitBackend,
+}
+
+rate_limit_backend = BACKENDS[RATE_LIMIT_BACKEND]()
+
+def client_ip(request: Request, trusted_hops: int = RATE_LIMIT_TRUSTED_HOPS) -> str:
+    if trusted_hops:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        # Con menos entradas que proxies la cabecera no la completaron los nuestros: se ignora
+        if len(hops) >= trusted_hops:
+            return hops[-trusted_hops]
+    return request.client.host if request.client else "unknown"
+
+def _key(scope: str, value: str) -> str:
+    return f"{scope}:{value.strip().lower()}"
+
+async def enforce_rate_limit(action: str, request: Request, email: str | None = None):
+    # Se llama antes de tocar la base o bcrypt; se comprueba la IP y, si hay, el email objetivo
+    if not RATE_LIMIT_ENABLED:
+        return
+    checks = [(f"{action}:ip", client_ip(request))]
+    if email:
+        checks.append((f"{action}:email", email))
+    for scope, value in checks:
+        limit, window = RATE_LIMITS[scope]
+        retry_after = await rate_limit_backend.hit(_key(scope, value), limit, window)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+async def clear_rate_limit(action: str, request: Request, email: str):
+    # Un login correcto limpia el contador del email y devuelve su intento al de la IP: solo cuentan
+    # los fallidos, así que una NAT o un proxy con muchos usuarios legítimos no agota el límite
+    if RATE_LIMIT_ENABLED:
+        scope = f"{action}:email"
+        await rate_limit_backend.reset(_key(scope, email), RATE_LIMITS[scope][1])
+        scope = f"{action}:ip"
+        await rate_limit_backend.refund(_key(scope, client_ip(request)), RATE_LIMITS[scope][1])
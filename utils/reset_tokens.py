@@ -0,0 +1,102 @@
+# utils/reset_tokens.py
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal
+from models import models
+
+RESET_TOKEN_BACKEND = os.getenv("RESET_TOKEN_BACKEND", "database")
+RESET_TOKEN_TTL_MINUTES = int(os.getenv("RESET_TOKEN_TTL_MINUTES", "60"))
+RESET_TOKEN_SWEEP_SECONDS = int(os.getenv("RESET_TOKEN_SWEEP_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class DatabaseResetTokenStore:
+    # Compartido entre workers; el token en claro solo viaja en el email
+    async def add(self, db: AsyncSession, token_hash: str, email: str, expires_at: datetime):
+        # Sin commit: el llamador lo confirma junto con el email encolado
+        db.add(models.PasswordResetToken(token_hash=token_hash, email=email, expires_at=expires_at))
+
+    async def pop(self, db: AsyncSession, token_hash: str):
+        row = (await db.execute(
+            select(models.PasswordResetToken.email, models.PasswordResetToken.expires_at)
+            .where(models.PasswordResetToken.token_hash == token_hash)
+        )).first()
+        if row is None:
+            return None
+        # Si otra petición lo canjeó a la vez, solo una borra la fila. Sin commit: el borrado se
+        # confirma junto con la nueva contraseña y, si algo falla antes, el token sigue siendo válido
+        result = await db.execute(
+            delete(models.PasswordResetToken).where(models.PasswordResetToken.token_hash == token_hash)
+        )
+        return (row.email, row.expires_at) if result.rowcount == 1 else None
+
+    async def sweep(self, now: datetime):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(models.PasswordResetToken).where(models.PasswordResetToken.expires_at <= now)
+            )
+            await db.commit()
+            return result.rowcount
+
+class MemoryResetTokenStore:
+    # Un solo proceso: dict para la búsqueda y un heap de expiraciones para el barrido
+    def __init__(self):
+        self._tokens = {}
+        self._expiry = []
+
+    async def add(self, db: AsyncSession, token_hash: str, email: str, expires_at: datetime):
+        self._tokens[token_hash] = (email, expires_at)
+        heapq.heappush(self._expiry, (expires_at, token_hash))
+
+    async def pop(self, db: AsyncSession, token_hash: str):
+        # La entrada del heap queda huérfana y se descarta al expirar
+        return self._tokens.pop(token_hash, None)
+
+    async def sweep(self, now: datetime):
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, token_hash = heapq.heappop(self._expiry)
+            entry = self._tokens.get(token_hash)
+            if entry is not None and entry[1] == expires_at:
+                del self._tokens[token_hash]
+                removed += 1
+        return removed
+
+STORES = {
+    "database": DatabaseResetTokenStore,
+    "memory": MemoryResetTokenStore,
+}
+
+reset_token_store = STORES[RESET_TOKEN_BACKEND]()
+
+async def issue_reset_token(db: AsyncSession, email: str) -> str:
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(minutes=RESET_TOKEN_TTL_MINUTES)
+    await reset_token_store.add(db, hash_token(token), email, expires_at)
+    return token
+
+async def redeem_reset_token(db: AsyncSession, token: str):
+    # Consume el token (un solo uso); devuelve (email, expires_at) o None
+    return await reset_token_store.pop(db, hash_token(token))
+
+async def sweep_reset_tokens_forever():
+    while True:
+        await asyncio.sleep(RESET_TOKEN_SWEEP_SECONDS)
+        try:
+            removed = await reset_token_store.sweep(datetime.utcnow())
+            if removed:
+                logger.info("Removed %d expired password reset tokens", removed)
+        except Exception:
+            logger.exception("Password reset token sweep failed")
@@ -0,0 +1,38 @@
+# utils/token_versions.py
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import models
+from utils.cache import TTLCache
+from utils.versions import upsert_increment
+
+# Otros procesos ven una revocación como mucho TOKEN_VERSION_CACHE_TTL segundos tarde
+TOKEN_VERSION_CACHE_SIZE = int(os.getenv("TOKEN_VERSION_CACHE_SIZE", "10000"))
+TOKEN_VERSION_CACHE_TTL = int(os.getenv("TOKEN_VERSION_CACHE_TTL", "30"))
+token_version_cache = TTLCache(maxsize=TOKEN_VERSION_CACHE_SIZE, ttl=TOKEN_VERSION_CACHE_TTL)
+
+async def get_token_version(db: AsyncSession, role: str, principal_id: int) -> int:
+    # Sin fila la versión es 0: solo tienen fila los principales con algún cambio de contraseña o baja
+    key = (role, principal_id)
+    version = token_version_cache.get(key)
+    if version is None:
+        version = await db.scalar(select(models.TokenVersion.version).where(
+            models.TokenVersion.role == role,
+            models.TokenVersion.principal_id == principal_id,
+        )) or 0
+        token_version_cache.set(key, version)
+    return version
+
+async def revoke_tokens(db: AsyncSession, role: str, principal_id: int):
+    # Va en la transacción del llamador (cambio de contraseña o baja); tras el commit
+    # invalidate_principal(..., principal_id=...) descarta la versión cacheada
+    await db.execute(upsert_increment(
+        db, models.TokenVersion,
+        [{"role": role, "principal_id": principal_id, "version": 1}],
+        ["role", "principal_id"],
+    ))
+
+def forget_token_version(role: str, principal_id: int):
+    token_version_cache.pop((role, principal_id))
@@ -0,0 +1,165 @@
+# utils/trainer_stats.py
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal
+from models import models
+from utils.assignments import insert_ignore
+
+TRAINER_STATS_RECONCILE_SECONDS = int(os.getenv("TRAINER_STATS_RECONCILE_SECONDS", "3600"))
+
+STAT_FIELDS = (
+    "users",
+    "workout_plans",
+    "nutrition_plans",
+    "routines",
+    "exercises",
+    "meals",
+    "workout_assignments",
+    "nutrition_assignments",
+)
+
+logger = logging.getLogger(__name__)
+
+def _stat_queries():
+    # Una consulta agrupada por entrenador para cada contador; todas usan los índices (trainer_id, id)
+    return {
+        "users": (models.User.trainer_id, select(models.User.trainer_id, func.count()).group_by(models.User.trainer_id)),
+        "workout_plans": (models.WorkoutPlan.trainer_id, select(models.WorkoutPlan.trainer_id, func.count())
+                          .group_by(models.WorkoutPlan.trainer_id)),
+        "nutrition_plans": (models.NutritionPlan.trainer_id, select(models.NutritionPlan.trainer_id, func.count())
+                            .group_by(models.NutritionPlan.trainer_id)),
+        "routines": (models.Routine.trainer_id, select(models.Routine.trainer_id, func.count())
+                     .group_by(models.Routine.trainer_id)),
+        "exercises": (models.WorkoutPlan.trainer_id, select(models.WorkoutPlan.trainer_id, func.count())
+                      .join(models.Exercise, models.Exercise.workout_plan_id == models.WorkoutPlan.id)
+                      .group_by(models.WorkoutPlan.trainer_id)),
+        "meals": (models.NutritionPlan.trainer_id, select(models.NutritionPlan.trainer_id, func.count())
+                  .join(models.Meal, models.Meal.nutrition_plan_id == models.NutritionPlan.id)
+                  .group_by(models.NutritionPlan.trainer_id)),
+        "workout_assignments": (models.WorkoutPlan.trainer_id, select(models.WorkoutPlan.trainer_id, func.count())
+                                .join(models.user_workout_plans,
+                                      models.user_workout_plans.c.workout_plan_id == models.WorkoutPlan.id)
+                                .group_by(models.WorkoutPlan.trainer_id)),
+        "nutrition_assignments": (models.NutritionPlan.trainer_id, select(models.NutritionPlan.trainer_id, func.count())
+                                  .join(models.user_nutrition_plans,
+                                        models.user_nutrition_plans.c.nutrition_plan_id == models.NutritionPlan.id)
+                                  .group_by(models.NutritionPlan.trainer_id)),
+    }
+
+async def compute_trainer_stats(db: AsyncSession, trainer_ids=None):
+    # Recuento desde las tablas de origen: {trainer_id: {campo: valor}}
+    every_trainer = trainer_ids is None
+    if every_trainer:
+        trainer_ids = (await db.scalars(select(models.Trainer.id))).all()
+    result = {trainer_id: dict.fromkeys(STAT_FIELDS, 0) for trainer_id in trainer_ids}
+    if not result:
+        return result
+    for field, (trainer_column, query) in _stat_queries().items():
+        if not every_trainer:
+            query = query.where(trainer_column.in_(list(result)))
+        for trainer_id, count in (await db.execute(query)).all():
+            if trainer_id in result:
+                result[trainer_id][field] = count
+    return result
+
+def create_trainer_stats(db: AsyncSession, trainer_id: int):
+    # Fila a cero para un entrenador recién creado; a partir de ahí solo recibe deltas
+    db.add(models.TrainerStats(trainer_id=trainer_id, **dict.fromkeys(STAT_FIELDS, 0)))
+
+async def remove_trainer_stats(db: AsyncSession, trainer_id: int):
+    await db.execute(delete(models.TrainerStats).where(models.TrainerStats.trainer_id == trainer_id))
+
+async def adjust_trainer_stats(db: AsyncSession, trainer_id, **deltas):
+    # Va en la transacción del llamador; sin fila no se hace nada (la crea la lectura o el reconcile)
+    values = {
+        field: getattr(models.TrainerStats, field) + delta
+        for field, delta in deltas.items() if delta
+    }
+    if trainer_id is None or not values:
+        return
+    await db.execute(
+        update(models.TrainerStats).where(models.TrainerStats.trainer_id == trainer_id).values(**values)
+    )
+
+async def count_rows(db: AsyncSession, column, value) -> int:
+    return await db.scalar(select(func.count()).where(column == value))
+
+async def remove_user_stats(db: AsyncSession, user_id: int, trainer_id):
+    # Antes de borrar al usuario: resta el usuario a su entrenador y sus asignaciones al dueño de cada plan
+    await adjust_trainer_stats(db, trainer_id, users=-1)
+    for field, plan_model, association, plan_key in (
+        ("workout_assignments", models.WorkoutPlan, models.user_workout_plans, "workout_plan_id"),
+        ("nutrition_assignments", models.NutritionPlan, models.user_nutrition_plans, "nutrition_plan_id"),
+    ):
+        rows = (await db.execute(
+            select(plan_model.trainer_id, func.count())
+            .join(association, association.c[plan_key] == plan_model.id)
+            .where(association.c.user_id == user_id)
+            .group_by(plan_model.trainer_id)
+        )).all()
+        for owner_id, count in rows:
+            await adjust_trainer_stats(db, owner_id, **{field: -count})
+
+def stats_response(stats):
+    data = {field: getattr(stats, field) for field in STAT_FIELDS}
+    data["exercises_per_plan"] = round(data["exercises"] / data["workout_plans"], 2) if data["workout_plans"] else 0.0
+    data["meals_per_plan"] = round(data["meals"] / data["nutrition_plans"], 2) if data["nutrition_plans"] else 0.0
+    return data
+
+async def get_trainer_stats(db: AsyncSession, trainer_id: int):
+    # Lectura por clave primaria; si el entrenador aún no tiene fila se calcula y se guarda. Dos
+    # primeras lecturas a la vez insertan la misma fila: la que llega segunda no hace nada
+    stats = await db.get(models.TrainerStats, trainer_id)
+    if stats is None:
+        counts = (await compute_trainer_stats(db, [trainer_id]))[trainer_id]
+        await db.execute(insert_ignore(db, models.TrainerStats).values(
+            trainer_id=trainer_id, reconciled_at=datetime.utcnow(), **counts
+        ))
+        await db.commit()
+        stats = await db.get(models.TrainerStats, trainer_id)
+    return stats
+
+async def reconcile_trainer_stats(db: AsyncSession) -> int:
+    # Corrige la deriva con recuentos completos; solo escribe las filas que difieren. Un delta
+    # concurrente puede perderse si coincide con la pasada, y lo corrige la siguiente
+    computed = await compute_trainer_stats(db)
+    current = {
+        stats.trainer_id: stats
+        for stats in (await db.scalars(select(models.TrainerStats))).all()
+    }
+    now = datetime.utcnow()
+    updates, inserts = [], []
+    for trainer_id, counts in computed.items():
+        stats = current.pop(trainer_id, None)
+        if stats is None:
+            inserts.append({"trainer_id": trainer_id, "reconciled_at": now, **counts})
+        elif any(getattr(stats, field) != counts[field] for field in STAT_FIELDS):
+            updates.append({"trainer_id": trainer_id, "reconciled_at": now, **counts})
+
+    if inserts:
+        # Una lectura concurrente puede haber creado ya alguna de estas filas
+        await db.execute(insert_ignore(db, models.TrainerStats), inserts)
+    if updates:
+        await db.execute(update(models.TrainerStats), updates)
+    if current:
+        # Filas de entrenadores que ya no existen
+        await db.execute(delete(models.TrainerStats).where(models.TrainerStats.trainer_id.in_(list(current))))
+    await db.commit()
+    return len(inserts) + len(updates) + len(current)
+
+async def reconcile_trainer_stats_forever():
+    while True:
+        await asyncio.sleep(TRAINER_STATS_RECONCILE_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                corrected = await reconcile_trainer_stats(db)
+            if corrected:
+                logger.info("Reconciled trainer stats for %d trainers", corrected)
+        except Exception:
+            logger.exception("Trainer stats reconcile failed")
@@ -0,0 +1,159 @@
+# utils/user_import.py
+import codecs
+import csv
+import json
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import models
+import schemas.schemas as schemas
+from utils.auth import get_password_hashes_async
+from utils.trainer_stats import adjust_trainer_stats
+from utils.versions import bump_versions
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+MAX_REPORTED_ERRORS = 1000
+
+async def iter_lines(stream):
+    # Decodifica el cuerpo por trozos sin cargarlo entero en memoria
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def iter_rows(stream, fmt: str):
+    # Produce (número de fila, dict); los campos CSV con saltos de línea no se admiten
+    header = None
+    number = 0
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [value.strip() for value in values]
+                continue
+            number += 1
+            yield number, {key: value for key, value in zip(header, values) if value != ""}
+        else:
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, e
+                continue
+            yield number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row: int, email, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "email": email, "error": message})
+
+    def as_dict(self):
+        # El reintento fila a fila de un lote añade sus errores después de los ya validados
+        errors = sorted(self.errors, key=lambda error: error["row"])
+        return {"created": self.created, "failed": self.failed, "errors": errors}
+
+async def _insert_batch(db: AsyncSession, rows):
+    # Inserción multi-fila de usuarios y alta en el directorio de cuentas en una sentencia; la
+    # versión del entrenador sube en la misma transacción para invalidar el ETag de su listado
+    await db.execute(insert(models.User), rows)
+    emails = [row["email"] for row in rows]
+    await db.execute(
+        insert(models.Account).from_select(
+            ["email", "role", "principal_id"],
+            select(models.User.email, literal("user"), models.User.id)
+            .where(models.User.email.in_(emails))
+        )
+    )
+    await adjust_trainer_stats(db, rows[0]["trainer_id"], users=len(rows))
+    await bump_versions(db, trainer_ids=[rows[0]["trainer_id"]])
+
+async def _import_batch(db: AsyncSession, batch, trainer_id: int, report: ImportReport):
+    emails = [user.email for _, user in batch]
+    taken = set((await db.scalars(
+        select(models.Account.email).where(models.Account.email.in_(emails))
+    )).all())
+
+    pending = []
+    for number, user in batch:
+        if user.email in taken:
+            report.error(number, user.email, "Email already registered")
+        else:
+            pending.append((number, user))
+    if not pending:
+        return
+
+    hashes = await get_password_hashes_async([user.password for _, user in pending])
+    rows = [
+        {
+            "email": user.email,
+            "full_name": user.full_name,
+            "hashed_password": hashed,
+            "trainer_id": trainer_id,
+        }
+        for (_, user), hashed in zip(pending, hashes)
+    ]
+
+    try:
+        await _insert_batch(db, rows)
+        await db.commit()
+        report.created += len(rows)
+    except IntegrityError:
+        # Otro proceso registró alguno de los emails; se reintenta fila por fila
+        await db.rollback()
+        for (number, user), row in zip(pending, rows):
+            try:
+                await _insert_batch(db, [row])
+                await db.commit()
+                report.created += 1
+            except IntegrityError:
+                await db.rollback()
+                report.error(number, user.email, "Email already registered")
+
+async def import_users(db: AsyncSession, stream, fmt: str, trainer_id: int):
+    report = ImportReport()
+    seen = set()
+    batch = []
+
+    async for number, row in iter_rows(stream, fmt):
+        if isinstance(row, Exception):
+            report.error(number, None, str(row))
+            continue
+        try:
+            user = schemas.UserCreate(**row)
+        except ValidationError as e:
+            message = "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+            report.error(number, row.get("email"), message)
+            continue
+        if user.email in seen:
+            report.error(number, user.email, "Duplicate email in import")
+            continue
+        seen.add(user.email)
+        batch.append((number, user))
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _import_batch(db, batch, trainer_id, report)
+            batch = []
+
+    if batch:
+        await _import_batch(db, batch, trainer_id, report)
+    return report.as_dict()
@@ -0,0 +1,91 @@
+# utils/user_plans.py
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from models import models
+from utils.cache import TTLCache
+
+# Documento de /user/plans/ por usuario; se invalida en cada asignación o cambio de plan
+USER_PLANS_CACHE_SIZE = int(os.getenv("USER_PLANS_CACHE_SIZE", "10000"))
+USER_PLANS_CACHE_TTL = int(os.getenv("USER_PLANS_CACHE_TTL", "300"))
+user_plans_cache = TTLCache(maxsize=USER_PLANS_CACHE_SIZE, ttl=USER_PLANS_CACHE_TTL)
+
+async def build_user_plans(db: AsyncSession, user_id: int):
+    # Cuatro consultas fijas: planes de cada tipo más sus hijos, sin recargar el usuario.
+    # Se ordena por la columna de la tabla intermedia (mismo valor) para aprovechar su PK
+    workout_plans = (await db.scalars(
+        select(models.WorkoutPlan)
+        .join(models.user_workout_plans,
+              models.user_workout_plans.c.workout_plan_id == models.WorkoutPlan.id)
+        .where(models.user_workout_plans.c.user_id == user_id)
+        .options(selectinload(models.WorkoutPlan.exercises))
+        .order_by(models.user_workout_plans.c.workout_plan_id)
+    )).all()
+    nutrition_plans = (await db.scalars(
+        select(models.NutritionPlan)
+        .join(models.user_nutrition_plans,
+              models.user_nutrition_plans.c.nutrition_plan_id == models.NutritionPlan.id)
+        .where(models.user_nutrition_plans.c.user_id == user_id)
+        .options(selectinload(models.NutritionPlan.meals))
+        .order_by(models.user_nutrition_plans.c.nutrition_plan_id)
+    )).all()
+
+    return {
+        "workout_plans": [
+            {
+                "id": plan.id,
+                "name": plan.name,
+                "description": plan.description,
+                "exercises": [
+                    {
+                        "name": exercise.name,
+                        "sets": exercise.sets,
+                        "reps": exercise.reps
+                    } for exercise in plan.exercises
+                ]
+            } for plan in workout_plans
+        ],
+        "nutrition_plans": [
+            {
+                "id": plan.id,
+                "name": plan.name,
+                "description": plan.description,
+                "meals": [
+                    {
+                        "name": meal.name,
+                        "description": meal.description,
+                        "calories": meal.calories
+                    } for meal in plan.meals
+                ]
+            } for plan in nutrition_plans
+        ]
+    }
+
+async def get_user_plans_document(db: AsyncSession, user_id: int, version: int):
+    # La entrada guarda la versión con la que se construyó; si otro worker la incrementó se reconstruye
+    cached = user_plans_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    document = await build_user_plans(db, user_id)
+    user_plans_cache.set(user_id, (version, document))
+    return document
+
+async def workout_plan_user_ids(db: AsyncSession, plan_id: int):
+    # Usuarios con el plan asignado; se consulta antes de modificarlo o borrarlo
+    return (await db.scalars(
+        select(models.user_workout_plans.c.user_id)
+        .where(models.user_workout_plans.c.workout_plan_id == plan_id)
+    )).all()
+
+async def nutrition_plan_user_ids(db: AsyncSession, plan_id: int):
+    return (await db.scalars(
+        select(models.user_nutrition_plans.c.user_id)
+        .where(models.user_nutrition_plans.c.nutrition_plan_id == plan_id)
+    )).all()
+
+def invalidate_user_plans(*user_ids):
+    for user_id in user_ids:
+        user_plans_cache.pop(user_id)
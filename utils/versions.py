@@ -0,0 +1,53 @@
+# utils/versions.py
+from fastapi import Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import models
+
+def upsert_increment(db: AsyncSession, model, rows, keys):
+    # Crea el contador a 1 o lo incrementa en la misma sentencia
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        return mysql_insert(model).values(rows).on_duplicate_key_update(version=model.version + 1)
+    if dialect == "sqlite":
+        return sqlite_insert(model).values(rows).on_conflict_do_update(
+            index_elements=keys, set_={"version": model.version + 1}
+        )
+    return insert(model).values(rows)
+
+async def bump_versions(db: AsyncSession, trainer_ids=(), user_ids=()):
+    # Se llama antes del commit de cada ruta que modifica datos; va en la misma transacción
+    rows = [{"scope": "trainer", "owner_id": owner_id, "version": 1} for owner_id in set(trainer_ids) if owner_id]
+    rows += [{"scope": "user", "owner_id": owner_id, "version": 1} for owner_id in set(user_ids) if owner_id]
+    if rows:
+        await db.execute(upsert_increment(db, models.DataVersion, rows, ["scope", "owner_id"]))
+
+async def get_version(db: AsyncSession, scope: str, owner_id: int) -> int:
+    version = await db.scalar(select(models.DataVersion.version).where(
+        models.DataVersion.scope == scope,
+        models.DataVersion.owner_id == owner_id,
+    ))
+    return version or 0
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    # If-None-Match usa comparación débil
+    return "*" in candidates or etag in [value.removeprefix("W/") for value in candidates]
+
+async def conditional_get(db: AsyncSession, request: Request, response: Response, scope: str, owner_id: int):
+    # Devuelve (versión, 304 o None); con un ETag vigente no se consultan las tablas de datos.
+    # Se lee la versión antes que los datos: en una carrera el ETag queda viejo y el cliente
+    # simplemente vuelve a descargar, nunca al revés
+    version = await get_version(db, scope, owner_id)
+    etag = f'"{scope}-{owner_id}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return version, Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return version, None